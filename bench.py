@@ -0,0 +1,252 @@
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from connect4 import Connect4
+from qlearner import QLearner
+from qtable import new_q_table, save_mapped
+from tictactoe import TicTacToe
+from transposition import TranspositionTable
+from util import Parameters, Player, load_q_table, param_or_default
+
+# benchmark suite for the games, search and training
+# results are printed (and optionally saved) as json, with every measurement under a fixed name so runs can be compared
+# counts such as perft and search nodes should never change unless the search itself changes,
+# times are compared as ratios against an earlier run
+#
+# usage: python bench.py [-quick] [-only perft,search,train,load] [-out results.json] [-compare old.json]
+
+# connect4 board sizes and the perft depths to count to, (full, quick)
+perft_sizes = {(4, 4): (8, 6), (5, 4): (7, 5), (7, 6): (6, 5)}
+# fixed positions to search from, as the moves played to reach them
+search_positions = {
+    "TicTacToe": {"empty": [], "midgame": [5, 1, 9]},
+    "Connect4_7x6": {"empty": [], "midgame": [4, 4, 3, 5, 3, 2]},
+}
+# the deepest search run for each player type, (full, quick)
+search_depths = {
+    "TicTacToe": {"minimax": (9, 9), "minimax_ab": (9, 9)},
+    "Connect4_7x6": {"minimax": (5, 4), "minimax_ab": (8, 6)},
+}
+
+
+# create a game with no visualisation
+def make_game(name: str, player1="minimax", player2="algo"):
+    if name == "TicTacToe":
+        return TicTacToe(Player(player1), Player(player2), False)
+    width, height = (int(n) for n in name.split("_")[1].split("x"))
+    return Connect4(Player(player1), Player(player2), False, (width, height))
+
+
+# play a list of moves from the empty board, alternating tokens
+def play_moves(game, moves: list[int]):
+    game.reset()
+    for i, move in enumerate(moves):
+        game.place_token(move, game.get_tokens()[i % 2])
+    game.current_token = game.get_tokens()[len(moves) % 2]
+
+
+# count the move sequences of a given length from the current position
+# games that are won before the end of a sequence are not played on
+def perft(game, depth: int) -> int:
+    if depth == 0:
+        return 1
+    token = game.get_tokens()[len(game.move_history) % 2]
+    nodes = 0
+    for move in game.get_remaining_moves():
+        game.place_token(move, token)
+        if depth == 1 or not game.check_last_win():
+            nodes += perft(game, depth - 1)
+        game.remove_token(move)
+    return nodes
+
+
+# run a function a number of times, returning the fastest time and the result of the last run
+def timed(function, repeats=1):
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+# perft counts and speed at each depth
+def bench_perft(quick: bool) -> dict:
+    results = {}
+    games = {"TicTacToe": 9 if not quick else 7}
+    games.update({f"Connect4_{w}x{h}": depths[quick] for (w, h), depths in perft_sizes.items()})
+    for name, max_depth in games.items():
+        game = make_game(name)
+        for depth in range(1, max_depth + 1):
+            game.reset()
+            seconds, nodes = timed(lambda: perft(game, depth))
+            results[f"perft/{name}/depth{depth}"] = {"nodes": nodes, "seconds": seconds, "nodes_per_sec": nodes / seconds}
+    return results
+
+
+# nodes searched, nodes per second and time to reach each depth for minimax with and without pruning
+# each search gets a fresh transposition table so the runs don't depend on each other
+def bench_search(quick: bool) -> dict:
+    results = {}
+    for name, positions in search_positions.items():
+        for player_type, depths in search_depths[name].items():
+            for position, moves in positions.items():
+                game = make_game(name)
+                max_depth = min(depths[quick], game.max_moves - len(moves))
+                for depth in range(1, max_depth + 1):
+                    play_moves(game, moves)
+                    game.max_depth = depth
+                    game.tt = TranspositionTable()
+                    game.nodes = 0
+                    alpha, beta = (float("-inf"), float("inf")) if player_type == "minimax_ab" else (None, None)
+                    seconds, move = timed(lambda: game.minimax_choose_move(alpha, beta))
+                    results[f"search/{name}/{player_type}/{position}/depth{depth}"] = {
+                        "nodes": game.nodes, "move": move, "seconds": seconds, "nodes_per_sec": game.nodes / seconds}
+    return results
+
+
+# training episodes per second, played directly and through train_once
+# train_once also plays the 1000 test games after the batch and saves the table, so it is run in a temporary directory
+def bench_train(quick: bool) -> dict:
+    results = {}
+    episodes = {"TicTacToe": 5000, "Connect4_7x6": 1000} if not quick else {"TicTacToe": 1000, "Connect4_7x6": 200}
+    params = {"TicTacToe": Parameters(True, 20.0, -20.0, 2.0, 0.0, 0.1),
+              "Connect4_7x6": Parameters(True, 47.0, -47.0, -2.0, 0.25, 0.05)}
+    for name, count in episodes.items():
+        game = make_game(name, "qlearn", "algo")
+        learner = QLearner(game, 1, count, 0)
+        random.seed(0)
+
+        def play_episodes():
+            for e in range(count):
+                learner.set_rates(e)
+                learner.play_episode(params[name])
+        seconds, _ = timed(play_episodes)
+        results[f"train/{name}/episodes"] = {"episodes": count, "states": len(learner.q_table), "seconds": seconds,
+                                             "episodes_per_sec": count / seconds}
+
+        learner = QLearner(game, 1, count, 0)
+        with tempfile.TemporaryDirectory() as directory, chdir(directory):
+            os.mkdir("q_tables")
+            seconds, _ = timed(lambda: learner.train_once(params[name]))
+        results[f"train/{name}/train_once"] = {"episodes": count, "seconds": seconds, "episodes_per_sec": count / seconds}
+    return results
+
+
+# time to load a q-table from each file format
+# the table is filled with the states of random connect4 games so it is a realistic size
+def bench_load(quick: bool) -> dict:
+    results = {}
+    states = 20000 if quick else 200000
+    game = make_game("Connect4_7x6")
+    q_table = new_q_table("Connect4", game.width)
+    rng = random.Random(0)
+    while len(q_table) < states:
+        game.reset()
+        for i in range(game.max_moves):
+            move = rng.choice(game.get_remaining_moves())
+            q_table.set(game.get_state(), move, rng.uniform(-50, 50))
+            game.place_token(move, game.get_tokens()[i % 2])
+            if game.check_last_win():
+                break
+    keys = list(q_table.keys())
+
+    with tempfile.TemporaryDirectory() as directory, chdir(directory):
+        os.mkdir("q_tables")
+        name = "Connect4_7x6_first"
+        with open(f"q_tables/{name}.pkl", "wb") as file:
+            pickle.dump(q_table, file)
+        with open(f"q_tables/{name}.json", "w") as file:
+            json.dump(q_table.to_dict(), file)
+        save_mapped(q_table, f"q_tables/{name}.qtb")
+        for file_format, pickled, mapped in (("pkl", True, False), ("json", False, False), ("qtb", True, True)):
+            seconds, table = timed(lambda: load_q_table(name, pickled, "Connect4", mapped), 3 if file_format != "json" else 1)
+            lookup_seconds, _ = timed(lambda: [table.key_offset(key) for key in keys[:10000]])
+            results[f"load/Connect4_7x6/{file_format}"] = {
+                "states": len(table), "bytes": os.path.getsize(f"q_tables/{name}.{file_format}"),
+                "seconds": seconds, "lookup_us": lookup_seconds / min(len(keys), 10000) * 1e6}
+    return results
+
+
+# change directory for the duration of a with block
+@contextlib.contextmanager
+def chdir(directory: str):
+    previous = os.getcwd()
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+# print how each result compares to an earlier run
+# counts that differ are flagged, as they mean the search or move generation behaves differently
+# times are shown as new / old, so below 1 is faster
+def compare(results: dict, previous: dict):
+    for name, metrics in results.items():
+        old = previous.get(name)
+        if old is None:
+            print(f"{name}: new")
+            continue
+        parts = []
+        for metric, value in metrics.items():
+            if metric not in old:
+                continue
+            if metric in ("seconds", "lookup_us"):
+                parts.append(f"{metric} x{value / old[metric]:.2f}" if old[metric] else metric)
+            elif metric in ("nodes", "move", "states") and value != old[metric]:
+                parts.append(f"{metric} CHANGED {old[metric]} -> {value}")
+        print(f"{name}: {', '.join(parts)}")
+
+
+# get a file name from the command line, keeping its case
+def path_arg(args, flag: str) -> str | None:
+    return args[args.index(flag) + 1] if flag in args else None
+
+
+# information about the machine and code the benchmarks were run on
+def run_info(quick: bool) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = None
+    return {"date": datetime.now().isoformat(timespec="seconds"), "commit": commit, "quick": quick,
+            "python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform()}
+
+
+benchmarks = {"perft": bench_perft, "search": bench_search, "train": bench_train, "load": bench_load}
+
+if __name__ == "__main__":
+    args = sys.argv
+    quick = "-quick" in args
+    only = param_or_default(args, "-only", ",".join(benchmarks)).split(",")
+    results = {}
+    for name in only:
+        print(f"Running {name} benchmarks...", file=sys.stderr)
+        # the games and learner print as they go, which would get mixed into the results
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            results.update(benchmarks[name](quick))
+
+    output = {"info": run_info(quick), "results": results}
+    out = path_arg(args, "-out")
+    if out is not None:
+        with open(out, "w") as file:
+            json.dump(output, file, indent=2)
+    previous = path_arg(args, "-compare")
+    if previous is not None:
+        with open(previous) as file:
+            compare(results, json.load(file)["results"])
+    else:
+        print(json.dumps(output, indent=2))
@@ -0,0 +1,127 @@
+import copy
+import struct
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+from qtable import state_key
+from transposition import TranspositionTable
+
+# header of a book file - magic, number of cells on the board, plies covered, search depth, number of positions
+book_header = struct.Struct("<4sBBBI")
+book_magic = b"BOOK"
+
+# the copy of the game each book building worker searches with
+worker_game = None
+
+
+# opening book - the best move for every position in the first few plies of the game, found offline by a deep search
+# positions are stored in canonical form, so a position and its mirror image share an entry
+# the file holds the sorted state keys, each a fixed number of big-endian bytes, each followed by a byte for the move
+# the whole book is read into a dictionary, so a lookup is a single dictionary access
+class OpeningBook:
+    def __init__(self, cells: int, plies: int, depth: int, moves: dict[int, int]):
+        self.cells = cells
+        self.plies = plies
+        self.depth = depth
+        self.moves = moves  # canonical state key: move in the canonical orientation
+        self.key_bytes = ((3 ** cells - 1).bit_length() + 7) // 8
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    # the book move for the game's current position, or None if the position isn't in the book
+    def lookup(self, game) -> int | None:
+        if len(game.move_history) > self.plies or game.max_moves != self.cells:
+            return None
+        canonical, symmetry = game.canonical_state(game.get_state())
+        move = self.moves.get(state_key(canonical))
+        if move is None:
+            return None
+        return game.board_move(move, symmetry)
+
+    def save(self, file_name: str):
+        with open(file_name, "wb") as file:
+            file.write(book_header.pack(book_magic, self.cells, self.plies, self.depth, len(self.moves)))
+            file.write(b"".join(key.to_bytes(self.key_bytes, "big") + bytes([self.moves[key]]) for key in sorted(self.moves)))
+
+    @classmethod
+    def load(cls, file_name: str):
+        with open(file_name, "rb") as file:
+            data = file.read()
+        magic, cells, plies, depth, count = book_header.unpack_from(data)
+        if magic != book_magic:
+            raise ValueError(f"{file_name} is not an opening book")
+        book = cls(cells, plies, depth, {})
+        entry_size = book.key_bytes + 1
+        for start in range(book_header.size, book_header.size + count * entry_size, entry_size):
+            book.moves[int.from_bytes(data[start:start + book.key_bytes], "big")] = data[start + book.key_bytes]
+        return book
+
+
+# find every position reachable in up to `plies` moves, returning the moves to reach one of each canonical position
+# positions where the game has already been won are left out, as there is no move to make
+def book_positions(game, plies: int) -> dict[str, list[int]]:
+    positions = {}
+
+    def visit(moves: list[int]):
+        canonical, _ = game.canonical_state(game.get_state())
+        if canonical in positions:
+            return
+        positions[canonical] = list(moves)
+        if len(moves) == plies:
+            return
+        token = game.get_tokens()[len(moves) % 2]
+        for move in game.get_remaining_moves():
+            game.place_token(move, token)
+            if not game.check_last_win():
+                moves.append(move)
+                visit(moves)
+                moves.pop()
+            game.remove_token(move)
+
+    game.reset()
+    visit([])
+    return positions
+
+
+# set up a book building worker process with its own copy of the game and transposition table
+def init_book_worker(game, tt_memory):
+    global worker_game
+    worker_game = game
+    worker_game.tt = TranspositionTable(tt_memory) if tt_memory else None
+
+
+# search a position for the book, returning the best move in the orientation of the canonical state
+def search_position(moves: list[int]) -> int:
+    game = worker_game
+    game.reset()
+    for i, move in enumerate(moves):
+        game.place_token(move, game.get_tokens()[i % 2])
+    game.current_token = game.get_tokens()[len(moves) % 2]
+    move = game.pvs_choose_move()
+    _, symmetry = game.canonical_state(game.get_state())
+    return game.canonical_move(move, symmetry)
+
+
+# build an opening book by searching every position in the first `plies` plies to the game's max depth
+# pvs is used as it searches the fewest nodes - with a max depth covering the rest of the game, the positions are solved
+# the positions are searched over a pool of worker processes if there is more than one worker
+def build_book(game, plies: int, workers: int = 1) -> OpeningBook:
+    # the searches use a copy of the game, so the book can't be used while it is being built
+    search_game = copy.copy(game)
+    search_game.book = None
+    search_game.stats = None
+    search_game.visualise = False
+    search_game.time_budget = None
+    search_game.ordering = None
+    positions = book_positions(search_game, plies)
+    keys = [state_key(canonical) for canonical in positions]
+    tt_memory = game.tt.memory if game.tt is not None else 0
+    if workers > 1:
+        with Pool(workers, initializer=init_book_worker, initargs=(search_game, tt_memory / workers)) as pool:
+            moves = list(tqdm(pool.imap(search_position, positions.values()), total=len(positions)))
+    else:
+        init_book_worker(search_game, tt_memory)
+        moves = [search_position(position) for position in tqdm(positions.values())]
+    return OpeningBook(game.max_moves, plies, game.max_depth, dict(zip(keys, moves)))
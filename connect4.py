@@ -1,193 +1,72 @@
-import random
-import time
 from typing import override
 import sys
 
-from game import Game, clear_screen
+from game import Game
+from kernel import Connect4Kernel
 from util import param_or_default
 
 BLANK = "  "
 
 
-# inherit from the Game class
-# implements the methods specific to the Connect4 game
-class Connect4(Game):
+# inherit from the Game class and the Connect4 kernel
+# the kernel has the board and rules, this adds the tokens and display
+class Connect4(Connect4Kernel, Game):
     input_name = "column"
     def __init__(self, player1, player2, visualise, board_size=(7, 6), max_depth=100, q_table=None):
-        super().__init__(player1, player2, visualise, max_depth, q_table)
-        self.width = board_size[0]
-        self.height = board_size[1]
-        self.cells = [[BLANK] * self.width for _ in range(self.height)]
-        self.cols = [x for x in range(1, self.width + 1)]
+        Game.__init__(self, player1, player2, visualise, max_depth, q_table)
+        Connect4Kernel.__init__(self, board_size)
 
-        self.max_moves = self.width * self.height
         self.start_instructions = f"Welcome to Connect 4! The game is played using the keyboard with 1-{self.width} corresponding to each column."
 
     # reset the game back to its initial state
     @override
     def reset(self):
-        self.cells = [[BLANK] * self.width for _ in range(self.height)]
-        self.cols = [x for x in range(1, self.width + 1)]
+        super().reset()
         self.current_token = self.get_tokens()[0]
 
-    # place a token on top of the column
+    # set the board up from a state string, with the player to move given by the number of tokens
     @override
-    def place_token(self, col: int, token: str = None):
-        if token is None:
-            token = self.current_token
-        for i in range(self.height):
-            if self.cells[i][col - 1] == BLANK:
-                self.cells[i][col - 1] = token
-                # if token placed in top row, remove column from available moves
-                if i == self.height - 1:
-                    self.cols[col - 1] = " "
-                return
-
-    # remove the top token from a column
-    @override
-    def remove_token(self, col):
-        for i in reversed(range(self.height)):
-            if self.cells[i][col - 1] != BLANK:
-                self.cells[i][col - 1] = BLANK
-                self.cols[col - 1] = col
-                return
-
-    # get the available moves
-    @override
-    def get_remaining_moves(self) -> list[int]:
-        return [x for x in self.cols if type(x) == int]
+    def set_state(self, state: str):
+        super().set_state(state)
+        self.current_token = self.get_tokens()[len(self.move_history) % 2]
+
+    # build the grid of tokens from the bitboards
+    # only used for display
+    @property
+    def cells(self) -> list[list[str]]:
+        tokens = self.get_tokens()
+        cells = [[BLANK] * self.width for _ in range(self.height)]
+        for row in range(self.height):
+            for col in range(self.width):
+                bit = 1 << (col * self.col_bits + row)
+                if self.boards[0] & bit:
+                    cells[row][col] = tokens[0]
+                elif self.boards[1] & bit:
+                    cells[row][col] = tokens[1]
+        return cells
+
+    # the column guides for display - full columns are blanked out
+    @property
+    def cols(self) -> list:
+        return [col if self.heights[col - 1] < self.height else " " for col in self.columns]
 
     # algorithmically construct the board for display
     # allows the board to be constructed based on the size provided by the user
     @override
     def get_board(self, guide=None) -> str:
+        cells = self.cells
         board = "╻" + "    ╻" * self.width + "\n"
 
         for row in reversed(range(self.height)):  # start from top row
-            board += "┃ " + " ┃ ".join(self.cells[row][:self.width]) + " ┃\n"
+            board += "┃ " + " ┃ ".join(cells[row]) + " ┃\n"
             if row > 0:
                 board += "┣" + "━━━━╋" * (self.width - 1) + "━━━━┫\n"
 
         board += "┗" + "━━━━┻" * (self.width - 1) + "━━━━┛\n"
-        board += "  " + "    ".join(map(str, self.cols[:self.width]))  # column guides at the bottom
+        board += "  " + "    ".join(map(str, self.cols))  # column guides at the bottom
 
         return board
 
-    # get the state of the board as a string
-    # convert the tokens to R, B and " "
-    @override
-    def get_state(self) -> str:
-        def convert_token(x: str):
-            match x:
-                case "  ":
-                    return " "
-                case "🔴":
-                    return "R"
-                case "🔵":
-                    return "B"
-        return "".join([convert_token(x) for row in self.cells for x in row])
-
-    # check for a win by checking all possible winning subsets
-    # if a token is provided, check if that token has won
-    @override
-    def check_win(self, token=None) -> bool:
-        for i in range(self.height):
-            for j in range(self.width):
-                potential_wins = []
-                # horizontal
-                if j <= self.width - 4:
-                    potential_wins.append([self.cells[i][j + k] for k in range(4)])
-                # vertical
-                if i <= self.height - 4:
-                    potential_wins.append([self.cells[i + k][j] for k in range(4)])
-                # diagonal (\)
-                if i <= self.height - 4 and j <= self.width - 4:
-                    potential_wins.append([self.cells[i + k][j + k] for k in range(4)])
-                # diagonal (/)
-                if i <= self.height - 4 and j >= 3:
-                    potential_wins.append([self.cells[i + k][j - k] for k in range(4)])
-                # check if any of the potential wins are valid
-                if token is None:
-                    outcomes = [subset[0] != BLANK and all(x == subset[0] for x in subset) for subset in potential_wins]
-                else:
-                    outcomes = [all(x == token for x in subset) for subset in potential_wins]
-                # if any of the potential wins are valid, return True
-                if any(outcomes):
-                    return True
-        return False
-
-    # count the number of runs of a token of a certain length
-    # a run a sequence of 4 tokens containing only the given token and blanks
-    # a run of 3 is one move away from winning
-    def count_runs(self, token, threshold):
-        c = self.cells
-        run_count = 0
-        for i in range(self.height):
-            for j in range(self.width):
-                runs = []
-                if j <= self.width - 4:
-                    runs.append([c[i][j + k] for k in range(4)])
-                if i <= self.height - 4:
-                    runs.append([c[i + k][j] for k in range(4)])
-                if i <= self.height - 4 and j <= self.width - 4:
-                    runs.append([c[i + k][j + k] for k in range(4)])
-                if i <= self.height - 4 and j >= 3:
-                    runs.append([c[i + k][j - k] for k in range(4)])
-
-                run_count += sum(1 for subset in runs if subset.count(token) == threshold and subset.count(BLANK) == 4 - threshold)
-        return run_count
-
-    # evaluate the state of the board for the minimax algorithm
-    # used if the depth is too low to reach the terminal state
-    @override
-    def evaluate_early(self, player, opponent) -> int:
-        # count the number of runs of 3 and 2 for the player and opponent
-        # return the difference between the two
-        good_runs_of_three = self.count_runs(player, 3)
-        good_runs_of_two = self.count_runs(player, 2)
-        bad_runs_of_three = self.count_runs(opponent, 3)
-        bad_runs_of_two = self.count_runs(opponent, 2)
-
-        # runs of 3 are worth 4 times as much as runs of 2
-        return good_runs_of_three * 4 + good_runs_of_two - bad_runs_of_three * 4 - bad_runs_of_two
-
-    # algorithmically choose a move
-    @override
-    def algorithm_choose_move(self):
-        if self.visualise:
-            clear_screen()
-            print(f"Player {self.current_token}\n{self.get_board()}")
-            time.sleep(0.2)
-
-        # first check if the player can win in the next move - if so, return that move
-        # then check if the opponent can win in the next move - if so, block that move
-        remaining_columns = self.get_remaining_moves()
-        for t in [self.current_token, self.get_other(self.current_token)]:
-            for col in remaining_columns:
-                self.place_token(col, t)
-                win = self.check_win()
-                self.remove_token(col)
-                if win:
-                    return col
-
-        # if no winning moves, find the move that results in the most runs of 3 - i.e. runs one move away from winning
-        # next, find the move that results in the most runs of 2
-        for threshold in [3, 2]:
-            baseline = self.count_runs(self.current_token, threshold)
-            highest_wins = ([], baseline)
-            for col in remaining_columns:
-                self.place_token(col)
-                wins = self.count_runs(self.current_token, threshold)
-                self.remove_token(col)
-                if wins > highest_wins[1]:
-                    highest_wins = ([col], wins)
-                elif wins == highest_wins[1]:
-                    highest_wins[0].append(col)
-            if highest_wins[1] > baseline:
-                return random.choice(highest_wins[0])
-        # if no runs of 3 or 2, choose randomly
-        return random.choice(remaining_columns)
-
     # return the tokens used in the game
     @staticmethod
     @override
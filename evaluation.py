@@ -0,0 +1,61 @@
+import copy
+import random
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+from transposition import TranspositionTable
+
+# the copy of the game each evaluation worker process plays with
+worker_game = None
+
+
+# set up an evaluation worker process with its own copy of the game
+# with the fork start method the q-tables are shared copy-on-write rather than copied, the workers only read them
+def init_eval_worker(game, tt_memory):
+    global worker_game
+    worker_game = game
+    worker_game.tt = TranspositionTable(tt_memory) if tt_memory else None
+
+
+# play a share of the games in a worker process, returning [player 1 wins, player 2 wins, ties]
+# games are numbered across all the workers, so the starting player alternates the same as when they're played one after another
+def play_games(task):
+    first_game, games, reverse_order, seed = task
+    game = worker_game
+    if seed is not None:
+        random.seed(f"{seed}-{first_game}")
+    stats = [0, 0, 0]
+    for i in range(first_game, first_game + games):
+        winner_index = game.play(bool(i % 2) if reverse_order is None else reverse_order)
+        stats[winner_index] += 1
+        game.reset()
+    return stats
+
+
+# play games between the game's players over a pool of worker processes, returning [player 1 wins, player 2 wins, ties]
+# if reverse_order isn't given the starting player alternates each game, otherwise it is used for every game
+# the games are split into a few chunks per worker so the progress bar moves and slow chunks don't hold up the rest
+# if a seed is given each chunk is seeded from it, so the results are the same for a given seed and number of workers
+def evaluate(game, games: int, workers: int, reverse_order=None, seed=None, progress=True) -> list[int]:
+    # the workers get a copy of the game without the parts they don't need
+    # each plays its games one at a time, searching serially, with a share of the transposition table's memory
+    worker_copy = copy.copy(game)
+    worker_copy.tt = None
+    worker_copy.parallel = None
+    worker_copy.mcts = None
+    worker_copy.workers = 1
+    worker_copy.visualise = False
+    worker_copy.ordering = type(game.ordering)(worker_copy) if game.ordering is not None else None
+    tt_memory = game.tt.memory / workers if game.tt is not None else 0
+
+    chunks = max(1, min(games, workers * 4))
+    sizes = [games // chunks + (c < games % chunks) for c in range(chunks)]
+    tasks = [(sum(sizes[:c]), size, reverse_order, seed) for c, size in enumerate(sizes)]
+    stats = [0, 0, 0]
+    with Pool(workers, initializer=init_eval_worker, initargs=(worker_copy, tt_memory)) as pool:
+        with tqdm(total=games, disable=not progress) as bar:
+            for chunk_stats, (_, size, _, _) in zip(pool.imap(play_games, tasks), tasks):
+                stats = [total + s for total, s in zip(stats, chunk_stats)]
+                bar.update(size)
+    return stats
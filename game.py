@@ -1,37 +1,86 @@
 import random
-from abc import ABC, abstractmethod
+import time
+from abc import abstractmethod
 from typing import Tuple
 
 from readchar import readkey
 from tqdm import trange
 
+from book import OpeningBook, build_book
+from evaluation import evaluate
+from kernel import Kernel
+from linear import LinearLearner, load_linear_models
+from mcts import MCTS
+from ordering import KillerHistoryOrdering, compare_orderings, orderings
+from parallel import ParallelSearch
 from qlearner import QLearner
+from replay import ReplayBuffer
+from qtable import state_key
+from solver import Solution, max_solve_cells, save_solution, solve
+from stats import Stats
+from tournament import run_tournament
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
 from util import *
+from vecenv import VecEnv
 
 BLANK = " "
 
 
 # abstract class for a game
-# TicTacToe and Connect4 inherit from this class, overriding the abstract methods to implement the specific game logic
+# TicTacToe and Connect4 inherit from this class and from their kernel, which implements the specific game logic
 # allows me to reuse logic for the game loop, player selection, and training
-class Game(ABC):
-    max_moves = 0
+class Game(Kernel):
     start_instructions = ""
+    # the guide shown to human players in place of the board, if the game has one
+    remaining_cells = None
+    # score for a win in negamax, larger than any evaluate_early score
+    win_score = 100000
+    # half the width of the aspiration window used by pvs around the previous depth's score
+    aspiration_window = 2
 
     def __init__(self, player1: Player, player2: Player, visualise: bool, max_depth: int = 42, q_tables=None):
         self.visualise = visualise
         self.players: Tuple[Player, Player] = (player1, player2)
-        self.cells = []
-        self.remaining_cells = None
+        self.token_index = {token: i for i, token in enumerate(self.get_tokens())}
         self.max_depth = max_depth
+        # the depth the current search stops at - the max depth, or less when deepening iteratively
+        self.search_depth = max_depth
+        # time allowed per minimax move in seconds, if set the search deepens until it runs out
+        self.time_budget = None
+        self.deadline = None
         self.current_token = self.get_tokens()[0]
+        # table of positions already searched by minimax, shared between the moves of a search
+        self.tt = TranspositionTable()
+        # the move ordering used with alpha-beta pruning, created on the first search as it depends on the board size
+        self.ordering = None
+        # number of positions visited by minimax, used to measure how well the search prunes
+        self.nodes = 0
+        # counts the searches, so parallel workers know when the root position has changed
+        self.search_id = 0
+        # number of processes minimax searches the root moves with, and the pool of them
+        self.workers = 1
+        self.parallel = None
+        # in a parallel worker, the best score found at the root by any worker
+        self.shared_alpha = None
+        # counters and timers for the search, only recorded if turned on with -stats
+        self.stats = None
+        # opening book the minimax players take their first moves from, if one is loaded
+        self.book = None
+        # the solved values and best moves of every position, for the perfect player
+        self.solution = None
+        # the search tree of the mcts player, kept between moves, and the number of playouts it runs per move
+        self.mcts = None
+        self.playouts = 1000
         if q_tables is None:
             q_tables = {}
         self.q_tables = q_tables
+        # the value models of the linear players, by token
+        self.linear_models = {}
 
     # check if the game is over, i.e. a win or a tie
+    # only the last move can have ended the game, so only the lines through it are checked
     def game_over(self):
-        return self.check_win() or not self.get_remaining_moves()
+        return self.check_last_win() or not self.legal_mask()
 
     # runs the game loop and handles the game end
     def play(self, reverse_order=False) -> int:
@@ -50,41 +99,74 @@ class Game(ABC):
     def game_loop(self, reverse_order: bool) -> int:
         offset = 1 if reverse_order else 0
         # repeats until the board is full, at which point the game is a tie
+        won = 0
         for i in range(self.max_moves):
             player = self.players[(i + offset) % 2]
             pos = self.choose_move(player)  # get the move based on the player type
 
-            # place the token and check for a win
-            self.place_token(pos)
-            if self.check_win():
+            # make the move on the kernel and check for a win
+            _, won, done = self.step(pos)
+            if done:
                 break
             # if no win, swap the tokens and repeat
             self.swap_tokens()
-            self.print(f"Player {self.current_token}\n{self.get_board()}")
+            # the board is only drawn if it is going to be shown
+            if self.visualise:
+                print(f"Player {self.current_token}\n{self.get_board()}")
         # if the board is full there is no winner, the game is a tie; return 2
-        winner_index = self.players.index(player) if self.check_win() else 2
+        # the winner is found by turn rather than looking the player up, as players of the same type compare equal
+        winner_index = (i + offset) % 2 if won else 2
         return winner_index
 
     # choose a move based on the player type
     def choose_move(self, player: Player) -> int:
+        start, nodes = time.perf_counter(), self.nodes
+        # the player's own settings are swapped in for its move, and saved back after it
+        # so anything built during the move, like a search tree or transposition table, stays with the player
+        for name, value in player.settings.items():
+            setattr(self, name, value)
         match player.type:
             case "human":
                 move = self.human_choose_move()
             case "random":
                 move = random.choice(self.get_remaining_moves())
             case "algo":
+                self.show_turn()
                 move = self.algorithm_choose_move()
             case "minimax":
                 move = self.minimax_choose_move()
             case "minimax_ab":
                 move = self.minimax_choose_move(float("-inf"), float("inf"))
+            case "pvs":
+                move = self.pvs_choose_move()
+            case "mtdf":
+                move = self.pvs_choose_move(mtdf=True)
             case "qlearn":
                 move = self.qlearn_choose_move()
+            case "linear":
+                move = self.linear_models[self.current_token].choose_move(self, self.token_index[self.current_token])
+            case "perfect":
+                move = self.perfect_choose_move()
+            case "mcts":
+                move = self.mcts_choose_move()
             case _:
                 print("Invalid player type.")
                 exit()
+        for name in player.settings:
+            player.settings[name] = getattr(self, name)
+        # the search depth counts the plies below the root's children, so the deepest nodes are one ply further
+        if self.stats is not None:
+            self.stats.record_move(player.type, time.perf_counter() - start, self.nodes - nodes, self.search_depth + 1)
         return move
 
+    # show whose turn it is and the board before a computer player moves, if visualisation is enabled
+    # the pause lets the moves be followed
+    def show_turn(self):
+        if self.visualise:
+            clear_screen()
+            print(f"Player {self.current_token}\n{self.get_board()}")
+            time.sleep(0.2)
+
     # function to print a message if visualisation is enabled
     def print(self, message: str):
         if self.visualise:
@@ -113,49 +195,28 @@ class Game(ABC):
             readkey()
             clear_screen()
 
-    # reset the game state
-    @abstractmethod
-    def reset(self):
-        pass
-
     # get the current board for display
     @abstractmethod
     def get_board(self, override=None) -> str:
         pass
 
-    # get a string representation of the game state
-    @abstractmethod
-    def get_state(self) -> str:
-        pass
+    # the rest of the game is played in tokens, which are mapped to the kernel's integer players here
 
     # returns true if a win occurs
     # if a token is provided, checks if that token has won
-    @abstractmethod
     def check_win(self, token: str = None) -> bool:
-        pass
+        if token is None:
+            return self.has_won(0) or self.has_won(1)
+        return self.has_won(self.token_index[token])
 
     # evaluate the board state before a win
     # awards points based on how good the state is for the player
-    @abstractmethod
     def evaluate_early(self, player: str, opponent: str) -> int:
-        pass
+        return self.evaluate(self.token_index[player])
 
-    # place a token on the board
-    @abstractmethod
+    # place a token on the board, the current token if none is given
     def place_token(self, pos: int, token: str = None):
-        pass
-
-    # remove a token from the board
-    # used for the minimax algorithm
-    # as it places a token to evaluate the board state
-    @abstractmethod
-    def remove_token(self, pos):
-        pass
-
-    # return the available moves
-    @abstractmethod
-    def get_remaining_moves(self):
-        pass
+        self.place(pos, self.token_index[token if token is not None else self.current_token])
 
     # allows the human player to choose a move
     # reads the key pressed and returns the corresponding cell
@@ -178,51 +239,149 @@ class Game(ABC):
     # choose a move based on the minimax algorithm
     # this is the same for both games - game specific logic is overridden in the respective classes
     # alpha and beta are used for the alpha-beta pruning optimisation - if they are not provided, pruning is not used
+    # if there is a time budget, iterative deepening is used - the search is repeated one ply deeper each time
+    # until the time runs out, and the best move from the deepest search is returned
     def minimax_choose_move(self, alpha=None, beta=None) -> int:
-        player = self.current_token
-        best_score = float("-inf")
-        best_move = 0
+        # positions in the opening book don't need searching
+        book_move = self.book.lookup(self) if self.book is not None else None
+        if book_move is not None:
+            return book_move
+        moves = self.get_remaining_moves()
+        best_move = moves[0]
+        depths = self.start_search(self.time_budget is not None)
+        # with more than one worker, the root moves are searched in parallel
+        if self.workers > 1 and self.parallel is None:
+            self.parallel = ParallelSearch(self, self.workers)
+        search_root = self.parallel.search_root if self.parallel is not None else self.search_root
+
+        for depth in depths:
+            self.search_depth = depth
+            iteration_best, complete = search_root(moves, alpha, beta)
+            # the previous best move is searched first, so any move that finished is at least as good
+            if iteration_best is not None:
+                best_move = iteration_best
+            if not complete:
+                break
+            # search the best move first in the next iteration
+            moves.remove(best_move)
+            moves.insert(0, best_move)
 
+        self.deadline = None
+        return best_move
+
+    # search each move at the root with minimax, returning the best move and whether every move was searched
+    # if the time budget runs out, the best of the moves that finished is returned
+    def search_root(self, moves: list[int], alpha, beta) -> tuple[int | None, bool]:
+        player = self.current_token
         opponent = self.get_other(player)
-        for move in self.get_remaining_moves():
-            # place the token, get the best score for that move, and remove the token
-            # repeat this for each move to find the best one
-            self.place_token(move, player)
-            score = self.minimax(player, opponent, 0, False, alpha, beta)
-            self.remove_token(move)
+        history_length = len(self.move_history)
+        best_score = float("-inf")
+        best_move = None
+        try:
+            for move in moves:
+                # place the token, get the best score for that move, and remove the token
+                # repeat this for each move to find the best one
+                self.place_token(move, player)
+                score = self.minimax(player, opponent, 0, False, alpha, beta)
+                self.remove_token(move)
 
-            if score > best_score:
-                best_move = move
-                best_score = score
-        return best_move
+                if score > best_score:
+                    best_move = move
+                    best_score = score
+        except SearchTimeout:
+            self.undo_moves(history_length)
+            return best_move, False
+        return best_move, True
+
+    # set up the transposition table, move ordering and time budget for a new search
+    # returns the depths to search - with iterative deepening, every depth up to the max depth
+    def start_search(self, iterative: bool):
+        self.search_id += 1
+        if self.tt is not None:
+            self.tt.new_search()
+        if self.ordering is None:
+            self.ordering = KillerHistoryOrdering(self)
+        self.ordering.new_search()
+        if self.time_budget is not None:
+            self.deadline = time.perf_counter() + self.time_budget
+        if not iterative:
+            return [self.max_depth]
+        # no need to search deeper than the number of moves left in the game
+        return range(min(self.max_depth, self.max_moves - len(self.move_history) - 1) + 1)
+
+    # tell the move ordering about a move that caused an alpha-beta cutoff, and count it by ply
+    # depth 0 is the root's children, so it is ply 1
+    def record_cutoff(self, move: int, depth: int, token: str):
+        self.ordering.record_cutoff(move, depth, token, self.search_depth - depth)
+        if self.stats is not None:
+            self.stats.cutoff(depth + 1)
+
+    # take back the tokens placed by a search that ran out of time
+    def undo_moves(self, history_length: int):
+        while len(self.move_history) > history_length:
+            self.remove_token(self.move_history[-1])
 
     # the minimax algorithm
     def minimax(self, player: str, opponent: str, depth: int, maxing: bool, alpha, beta) -> int:
+        self.nodes += 1
         # reward the player if they win, penalise if the opponent wins
-        # reward is higher if the win is sooner, penalty is higher if the loss is later
-        if self.check_win(player):
-            return self.max_depth - depth + 1
-        elif self.check_win(opponent):
-            return self.max_depth + depth - 1
+        # reward is higher if the win is sooner, penalty is lower if the loss is later
+        # only the player who made the last move can have won - if it is the player's turn to maximise, that was the opponent
+        if self.check_last_win():
+            return -(self.max_depth - depth + 1) if maxing else self.max_depth - depth + 1
+
+        # stop the search if the time budget has run out
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout
 
         # if there are no moves left the game is a tie, return neutral reward
         remaining_moves = self.get_remaining_moves()
         if len(remaining_moves) == 0:
             return 0
 
-        # if the max depth is reached and no win occurs, evaluate the board state
-        if depth == self.max_depth:
+        # if the search depth is reached and no win occurs, evaluate the board state
+        if depth == self.search_depth:
+            if self.stats is not None:
+                self.stats.count("evaluate_early")
             return self.evaluate_early(player, opponent)
 
+        # if this position has already been searched at least as deep, reuse the score
+        # a bound can be used to narrow the alpha-beta window, or returned directly if it causes a cutoff
+        entry = self.tt.lookup(self.hash) if self.tt is not None else None
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[5]
+            if entry[3] >= self.search_depth - depth:
+                score, flag = entry[2], entry[4]
+                if flag == EXACT:
+                    return score
+                if alpha is not None:
+                    if flag == LOWER:
+                        alpha = max(alpha, score)
+                    else:
+                        beta = min(beta, score)
+                    if beta <= alpha:
+                        return score
+        original_alpha, original_beta = alpha, beta
+
+        # with alpha-beta pruning, search the moves most likely to cause a cutoff first
+        token = player if maxing else opponent
+        if alpha is not None:
+            remaining_moves = self.ordering.order(remaining_moves, depth, token, tt_move)
+
         # recursively call the minimax algorithm for each move
         # the algorithm alternates between maximising and minimising the score
+        best_move = None
         if maxing:
             best_score = float("-inf")
             for move in remaining_moves:
                 # place the token, get the maximum score for the player, and remove the token
                 self.place_token(move, player)
-                best_score = max(best_score, self.minimax(player, opponent, depth + 1, not maxing, alpha, beta))
+                score = self.minimax(player, opponent, depth + 1, not maxing, alpha, beta)
                 self.remove_token(move)
+                if score > best_score:
+                    best_score = score
+                    best_move = move
 
                 # alpha-beta pruning
                 # if the beta is less than or equal to the alpha, there can be no better move
@@ -230,14 +389,25 @@ class Game(ABC):
                 if alpha is not None:
                     alpha = max(alpha, best_score)
                     if beta <= alpha:
+                        self.record_cutoff(move, depth, token)
                         break
         else:
             best_score = float("inf")
             for move in remaining_moves:
+                # in a parallel search, pick up any better score another worker has found for a root move
+                # this node is then cut off as soon as it is shown to be no better
+                if depth == 0 and self.shared_alpha is not None and alpha is not None:
+                    alpha = max(alpha, self.shared_alpha.value)
+                    original_alpha = max(original_alpha, alpha)
+                    if beta <= alpha:
+                        break
                 # place the token, get the maximum score for the player, and remove the token
                 self.place_token(move, opponent)
-                best_score = min(best_score, self.minimax(player, opponent, depth + 1, not maxing, alpha, beta))
+                score = self.minimax(player, opponent, depth + 1, not maxing, alpha, beta)
                 self.remove_token(move)
+                if score < best_score:
+                    best_score = score
+                    best_move = move
 
                 # alpha-beta pruning
                 # if the beta is less than or equal to the alpha, there can be no better move
@@ -245,29 +415,217 @@ class Game(ABC):
                 if beta is not None:
                     beta = min(beta, best_score)
                     if beta <= alpha:
+                        self.record_cutoff(move, depth, token)
                         break
+
+        # store the score and best move in the transposition table
+        # if the score is outside the alpha-beta window, the search was cut off and it is only a bound
+        if self.tt is not None:
+            if original_alpha is not None and best_score <= original_alpha:
+                flag = UPPER
+            elif original_beta is not None and best_score >= original_beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.tt.store(self.hash, best_score, self.search_depth - depth, flag, best_move)
+        return best_score
+
+    # choose a move using negamax with principal variation search
+    # each depth is searched with an aspiration window around a guess of the score - if the score falls outside the window,
+    # it is searched again with the full window
+    # with mtdf, the score is instead found with a series of null window searches, relying on the transposition table
+    # like minimax_choose_move, the search only deepens one ply at a time if there is a time budget
+    # the score from the previous depth is then used as the guess for the next
+    def pvs_choose_move(self, mtdf=False) -> int:
+        book_move = self.book.lookup(self) if self.book is not None else None
+        if book_move is not None:
+            return book_move
+        moves = self.get_remaining_moves()
+        best_move = moves[0]
+        guess = 0
+        history_length = len(self.move_history)
+
+        for depth in self.start_search(self.time_budget is not None):
+            self.search_depth = depth
+            try:
+                score, move = self.mtdf(moves, guess) if mtdf else self.aspiration_search(moves, guess)
+            except SearchTimeout:
+                self.undo_moves(history_length)
+                break
+            best_move = move
+            guess = score
+            # search the best move first in the next iteration
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+            # stop once the result is proven to be a win or loss, searching deeper won't change it
+            if abs(score) > self.win_score - self.max_moves:
+                break
+
+        self.deadline = None
+        return best_move
+
+    # search the root with a narrow window around the guess, widening it if the score falls outside
+    def aspiration_search(self, moves: list[int], guess: int) -> tuple[int, int]:
+        alpha, beta = guess - self.aspiration_window, guess + self.aspiration_window
+        while True:
+            score, move = self.pvs_root(moves, alpha, beta)
+            if score <= alpha:
+                alpha = float("-inf")
+            elif score >= beta:
+                beta = float("inf")
+            else:
+                return score, move
+
+    # MTD(f) - repeated null window searches, each one moving the bound closer to the true score
+    # the best move comes from the last search that found a score at or above its bound
+    def mtdf(self, moves: list[int], guess: int) -> tuple[int, int]:
+        score, best_move = guess, moves[0]
+        lower, upper = float("-inf"), float("inf")
+        while lower < upper:
+            beta = score + 1 if score == lower else score
+            score, move = self.pvs_root(moves, beta - 1, beta)
+            if score < beta:
+                upper = score
+            else:
+                lower = score
+                best_move = move
+        return score, best_move
+
+    # search each move at the root, returning the best score and move
+    # unlike minimax_choose_move, alpha is raised as moves are searched, so later moves are searched with a tighter window
+    def pvs_root(self, moves: list[int], alpha, beta) -> tuple[int, int]:
+        token = self.current_token
+        other = self.get_other(token)
+        best_score, best_move = float("-inf"), moves[0]
+        for i, move in enumerate(moves):
+            self.place_token(move, token)
+            score = self.search_child(other, token, 0, alpha, beta, i == 0)
+            self.remove_token(move)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        return best_score, best_move
+
+    # search a move with principal variation search
+    # the first move is assumed to be the best and searched with the full window
+    # the rest are searched with a null window, which only proves whether they are better than alpha
+    # if one is, it is searched again with the full window to get its score
+    def search_child(self, token: str, other: str, depth: int, alpha, beta, first: bool) -> int:
+        if first:
+            return -self.negamax(token, other, depth, -beta, -alpha)
+        score = -self.negamax(token, other, depth, -alpha - 1, -alpha)
+        if alpha < score < beta:
+            score = -self.negamax(token, other, depth, -beta, -alpha)
+        return score
+
+    # negamax - the score is always from the point of view of the player whose turn it is
+    # so the same code handles both players, each negating the score of the other
+    def negamax(self, token: str, other: str, depth: int, alpha, beta) -> int:
+        self.nodes += 1
+        # if the last move won, the player to move has lost - losses later on are penalised less
+        if self.check_last_win():
+            return depth - self.win_score
+
+        # stop the search if the time budget has run out
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
+        # if there are no moves left the game is a tie
+        remaining_moves = self.get_remaining_moves()
+        if len(remaining_moves) == 0:
+            return 0
+
+        # if the search depth is reached and no win occurs, evaluate the board state
+        if depth == self.search_depth:
+            if self.stats is not None:
+                self.stats.count("evaluate_early")
+            return self.evaluate_early(token, other)
+
+        # reuse the score if this position has already been searched at least as deep
+        entry = self.tt.lookup(self.hash) if self.tt is not None else None
+        tt_move = None
+        if entry is not None:
+            tt_move = entry[5]
+            if entry[3] >= self.search_depth - depth:
+                score, flag = entry[2], entry[4]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER:
+                    alpha = max(alpha, score)
+                else:
+                    beta = min(beta, score)
+                if alpha >= beta:
+                    return score
+        original_alpha = alpha
+
+        best_score, best_move = float("-inf"), None
+        for i, move in enumerate(self.ordering.order(remaining_moves, depth, token, tt_move)):
+            self.place_token(move, token)
+            score = self.search_child(other, token, depth + 1, alpha, beta, i == 0)
+            self.remove_token(move)
+            if score > best_score:
+                best_score, best_move = score, move
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                self.record_cutoff(move, depth, token)
+                break
+
+        if self.tt is not None:
+            if best_score <= original_alpha:
+                flag = UPPER
+            elif best_score >= beta:
+                flag = LOWER
+            else:
+                flag = EXACT
+            self.tt.store(self.hash, best_score, self.search_depth - depth, flag, best_move)
         return best_score
 
+    # choose the best move from the solution of the game, without searching
+    def perfect_choose_move(self) -> int:
+        return self.solution.best_move(self)[1]
+
+    # choose a move with monte carlo tree search
+    # the tree is created on the first move, with a pool of rollout workers if there is more than one worker
+    def mcts_choose_move(self) -> int:
+        if self.mcts is None:
+            self.mcts = MCTS(self, self.workers)
+        return self.mcts.choose_move()
+
     # choose a move based on the qlearning algorithm
     def qlearn_choose_move(self) -> int:
-        # get the game state and the q-table for the current token
-        state = self.get_state()
-        q_table = self.q_tables[self.current_token]
+        # get the position's keys and the q-table for the current token
+        canonical, symmetry = self.canonical_key()
+        return self.qlearn_key_move(canonical, symmetry, self.position_key(), self.get_remaining_moves(),
+                                    self.q_tables[self.current_token])
+
+    # choose the best of the moves in a state from a q-table
+    # used by the vectorised environment, which has the state and moves without a board
+    def qlearn_move(self, state: str, moves: list[int], q_table) -> int:
+        canonical, symmetry = self.canonical_state(state)
+        return self.qlearn_key_move(state_key(canonical), symmetry, state_key(state), moves, q_table)
+
+    # choose the best of the moves in a position from a q-table, given the keys of the position and its canonical form
+    def qlearn_key_move(self, canonical: int, symmetry: int, key: int, moves: list[int], q_table) -> int:
+        # the table is keyed by canonical states, so the moves are mapped into the canonical state's orientation
         # if the state is in the q-table, get the best move based on the q-values
+        # tables trained before canonical states were used may only have the state as it is
         # if not, choose randomly from the available moves
-        if state in q_table:
-            moves = self.get_remaining_moves()
-            best_q = max(q_table[state][m] for m in moves)
-            best_moves = [m for m in moves if q_table[state][m] == best_q]
-            return random.choice(best_moves)
+        if q_table.key_offset(canonical) is not None:
+            q_values = q_table.key_values(canonical, [self.canonical_move(m, symmetry) for m in moves])
+        elif q_table.key_offset(key) is not None:
+            q_values = q_table.key_values(key, moves)
         else:
-            return random.choice(self.get_remaining_moves())
+            return random.choice(moves)
+        best_q = max(q_values)
+        best_moves = [m for m, q in zip(moves, q_values) if q == best_q]
+        return random.choice(best_moves)
 
     # choose a move based on an algorithm designed for the specific game
-    # implemented in each game class
-    @abstractmethod
+    # implemented in each game's kernel
     def algorithm_choose_move(self) -> int:
-        pass
+        return self.algorithm_move(self.token_index[self.current_token])
 
     # get the tokens for the game
     # simple way to allow me to use different tokens for different games but still share logic
@@ -285,8 +643,14 @@ class Game(ABC):
         batch_size = param_or_default(args, "-b", 50000)
         seed = param_or_default(args, "-s", random.randint(0, 1000000))
         order = param_or_default(args, "-o", "both")
+        workers = param_or_default(args, "-j", 1)
+        boards = param_or_default(args, "-vec", 1)
+        checkpoint_every = param_or_default(args, "-checkpoint", 1)
+        resume = "-resume" in args
+        # the learner to train - q-tables, or a linear model of the value of positions for boards too large for them
+        linear = param_or_default(args, "-learner", "qlearn") == "linear"
         # set up the game
-        game = cls(Player("qlearn"), Player("algo"), False, board_size)
+        game = cls(Player("linear" if linear else "qlearn"), Player("algo"), False, board_size)
 
         # set the parameters for the qlearning agents
         # allows for different parameters depending on the game and whether the agent goes first or second
@@ -301,10 +665,38 @@ class Game(ABC):
             second_parameters = Parameters(False, grid_size + 5.0, -grid_size - 5.0, -2.0, 0.3, 0.06)
 
         # train the agents
-        QLearner(game, batches, batch_size, seed).train(first_parameters, second_parameters, order)
+        if linear:
+            learner = LinearLearner(game, batches, batch_size, seed, param_or_default(args, "-mb", 256))
+        else:
+            # a batch of past moves is replayed after each episode if the replay buffer is turned on
+            replay = None
+            if "-replay" in args:
+                replay = ReplayBuffer(param_or_default(args, "-replay", 100000), param_or_default(args, "-replay-batch", 64),
+                                      "-prioritised" in args, seed)
+            learner = QLearner(game, batches, batch_size, seed, workers, boards, checkpoint_every, resume, replay)
+        stats_format = get_stats_format(args)
+        if stats_format is not None:
+            learner.stats = game.stats = Stats()
+        learner.train(first_parameters, second_parameters, order)
         print("Training complete.")
+        if stats_format is not None:
+            learner.stats.report(stats_format)
         exit()
 
+    # load the solution of the game for perfect players
+    # the game is solved the first time and saved
+    def load_solution(self, size="") -> Solution:
+        solution_name = f"solutions/{self.__class__.__name__}_{size}solution.bin"
+        if not os.path.exists(solution_name):
+            if self.max_moves > max_solve_cells:
+                print(f"The board is too large to solve, perfect players can only play on up to {max_solve_cells} cells.")
+                exit()
+            os.makedirs("solutions", exist_ok=True)
+            solution = solve(self)
+            save_solution(solution, self.max_moves, solution_name)
+            print(f"Saved {len(solution)} positions to {solution_name}")
+        return Solution.load(solution_name)
+
     # handles the command line arguments and starts the game
     # if -train is in the arguments, sets up the training environment
     @classmethod
@@ -312,6 +704,10 @@ class Game(ABC):
         args = sys.argv
         if "-train" in args:
             cls.training_setup(board_size)
+        # play every pair of players in a config file against each other
+        if "-tournament" in args:
+            run_tournament(cls, board_size, args)
+            exit()
 
         # get the parameters from the command line arguments
         player1, player2, games, max_depth = get_from_args(args)
@@ -319,10 +715,15 @@ class Game(ABC):
             max_depth = board_size[0] * board_size[1] if board_size is not None else cls.max_moves
         visualise = "-v" in args or player1 == "human" or player2 == "human"
 
+        # convert the saved q-tables to the memory-mapped format
+        size = f"{board_size[0]}x{board_size[1]}_" if cls.__name__ == "Connect4" else ""
+        if "-convert" in args:
+            convert_q_tables(cls.__name__, size)
+            exit()
+
         # if either player is a qlearning agent, load the q tables
         q_tables = {}
         if player1 == "qlearn" or player2 == "qlearn":
-            size = f"{board_size[0]}x{board_size[1]}_" if cls.__name__ == "Connect4" else ""
             q_tables = load_q_tables(cls.__name__, cls.get_tokens(), size, True)
 
         # initialise the players
@@ -332,15 +733,68 @@ class Game(ABC):
         # play the games, recording the wins/losses/ties
         stats = [0, 0, 0]
         game = cls(player1, player2, visualise, board_size, max_depth, q_tables)
+        game.time_budget = parse_duration(param_or_default(args, "-t", None))
+        game.ordering = orderings[param_or_default(args, "-order", "killer")](game)
+        game.workers = param_or_default(args, "-j", 1)
+        game.playouts = param_or_default(args, "-playouts", 1000)
+        if player1.type == "linear" or player2.type == "linear":
+            game.linear_models = load_linear_models(game, size)
+        stats_format = get_stats_format(args)
+        if stats_format is not None:
+            game.stats = Stats()
+
+        # report the nodes searched by minimax_ab from the start position with each move ordering
+        if "-order-report" in args:
+            nodes = compare_orderings(game)
+            for name, count in nodes.items():
+                print(f"{name}: {count} nodes ({1 - count / nodes['none']:.1%} fewer than no ordering)")
+            exit()
+        # the memory cap of the transposition table in megabytes, 0 turns it off
+        tt_memory = param_or_default(args, "-tt", None)
+        if tt_memory is not None:
+            game.tt = TranspositionTable(tt_memory) if tt_memory else None
+        # build an opening book covering the given number of plies, searched to the max depth
+        # otherwise, load the book for the game if asked to
+        book_name = f"books/{cls.__name__}_{size}book.bin"
+        if "-build-book" in args:
+            os.makedirs("books", exist_ok=True)
+            book = build_book(game, param_or_default(args, "-build-book", 4), game.workers)
+            book.save(book_name)
+            print(f"Saved {len(book)} positions to {book_name}")
+            exit()
+        if "-book" in args:
+            if not os.path.exists(book_name):
+                print(f"No opening book has been built for {cls.__name__} {size.rstrip('_')}.")
+                exit()
+            game.book = OpeningBook.load(book_name)
+
+        # the perfect player needs the game solved
+        if player1.type == "perfect" or player2.type == "perfect":
+            game.solution = game.load_solution(size)
+
         game.start_message()
-        for i in trange(games):
-            # the starting player alternates each game
-            winner_index = game.play(reverse_order=bool(i % 2))
-            stats[winner_index] += 1
-            game.reset()
+        # random, algo and qlearn players can play many games at once on the vectorised environment
+        boards = param_or_default(args, "-vec", 1)
+        if boards > 1 and not visualise and player1.type in VecEnv.player_types and player2.type in VecEnv.player_types:
+            stats = VecEnv(game, boards).play((player1.type, player2.type), games)
+        # with more than one game, -j plays the games over a pool of processes rather than splitting each search
+        elif game.workers > 1 and games > 1 and not visualise:
+            stats = evaluate(game, games, game.workers)
+        else:
+            for i in trange(games):
+                # the starting player alternates each game
+                winner_index = game.play(reverse_order=bool(i % 2))
+                stats[winner_index] += 1
+                game.reset()
+        if game.parallel is not None:
+            game.parallel.close()
+        if game.mcts is not None:
+            game.mcts.close()
 
         # print the final stats
         clear_screen()
         print(f"Player 1 ({player1.type}) wins: {stats[0]}")
         print(f"Player 2 ({player2.type}) wins: {stats[1]}")
         print(f"Ties: {stats[2]}")
+        if stats_format is not None:
+            game.stats.report(stats_format)
@@ -0,0 +1,529 @@
+import random
+from abc import ABC, abstractmethod
+from typing import override
+
+from transposition import zobrist_keys
+
+
+# headless simulation kernel - a game's board and rules, with no tokens, display or terminal I/O
+# players are the integers 0 and 1, with 0 moving first, and moves are numbered from 1 as in the games
+# the game classes inherit from their kernel and add the tokens and UI on top,
+# so training, evaluation and search all play on the kernel and the board is only drawn when it is shown
+class Kernel(ABC):
+    max_moves = 0
+    # the characters each player's tokens are given in the state string
+    state_tokens = ""
+
+    # clear the board
+    @abstractmethod
+    def reset(self):
+        pass
+
+    # place a player's token
+    @abstractmethod
+    def place(self, move: int, player: int):
+        pass
+
+    # take back a move
+    @abstractmethod
+    def remove_token(self, move: int):
+        pass
+
+    # returns true if the last move completed a win
+    @abstractmethod
+    def check_last_win(self) -> bool:
+        pass
+
+    # returns true if the player has a winning run anywhere on the board
+    @abstractmethod
+    def has_won(self, player: int) -> bool:
+        pass
+
+    # a heuristic score of the board for the player, used when the search can't reach the end of the game
+    @abstractmethod
+    def evaluate(self, player: int) -> int:
+        pass
+
+    # the move the game's hand-written algorithm makes for the player
+    @abstractmethod
+    def algorithm_move(self, player: int) -> int:
+        pass
+
+    # the state string of the board, used for q-table keys and to save positions
+    @abstractmethod
+    def get_state(self) -> str:
+        pass
+
+    # set the board up from a state string
+    @abstractmethod
+    def set_state(self, state: str):
+        pass
+
+    # a priority for each move, higher is usually better
+    @abstractmethod
+    def get_move_priority(self) -> dict[int, int]:
+        pass
+
+    # the index in the state string of the cell a legal move would place a token in
+    @abstractmethod
+    def move_cell(self, move: int) -> int:
+        pass
+
+    # the legal moves are kept as a bitmask by the kernels - bit m - 1 is set if move m can be made
+    def legal_mask(self) -> int:
+        return self.legal
+
+    # the list of legal moves for every legal mask, so get_remaining_moves is a lookup
+    def build_move_lists(self, moves: int):
+        self.move_lists = [[m for m in range(1, moves + 1) if mask >> (m - 1) & 1] for mask in range(1 << moves)]
+
+    # the legal moves, in order
+    # the list is copied, as the search reorders the moves it is given
+    def get_remaining_moves(self) -> list[int]:
+        return self.move_lists[self.legal][:]
+
+    # the player to move - the players take turns, so it is given by the number of moves made
+    def to_move(self) -> int:
+        return len(self.move_history) % 2
+
+    # make a move for the player to move
+    # returns the key of the new position, the reward for the player who moved - 1 for a win, otherwise 0 -
+    # and whether the game is over
+    def step(self, move: int) -> tuple[int, int, bool]:
+        self.place(move, len(self.move_history) % 2)
+        won = self.check_last_win()
+        return self.position_key(), int(won), won or len(self.move_history) == self.max_moves
+
+    # per-window token counts, kept up to date as tokens are placed and removed so the heuristics don't have to scan the board
+    # a window is a set of cells that could hold a winning run - a 4-window in Connect4, a winning subset in TicTacToe
+    # window_counts[player][w] is the number of the player's tokens in window w
+    # run_counts[player][k] is the number of windows holding k of the player's tokens and none of the opponent's
+    def reset_window_counts(self, windows: int, size: int):
+        self.window_counts = [[0] * windows, [0] * windows]
+        self.run_counts = [[windows] + [0] * size, [windows] + [0] * size]
+
+    # count a token placed by a player in each of the windows through its cell
+    # a window the opponent has no tokens in moves up one in the player's runs, and one the player had no tokens in
+    # stops being a run for the opponent
+    def add_window_token(self, player: int, windows):
+        own_counts, other_counts = self.window_counts[player], self.window_counts[1 - player]
+        own_runs, other_runs = self.run_counts[player], self.run_counts[1 - player]
+        for w in windows:
+            own, other = own_counts[w], other_counts[w]
+            if not other:
+                own_runs[own] -= 1
+                own_runs[own + 1] += 1
+            if not own:
+                other_runs[other] -= 1
+            own_counts[w] = own + 1
+
+    # undo add_window_token
+    def remove_window_token(self, player: int, windows):
+        own_counts, other_counts = self.window_counts[player], self.window_counts[1 - player]
+        own_runs, other_runs = self.run_counts[player], self.run_counts[1 - player]
+        for w in windows:
+            own, other = own_counts[w] - 1, other_counts[w]
+            if not other:
+                own_runs[own + 1] -= 1
+                own_runs[own] += 1
+            if not own:
+                other_runs[other] += 1
+            own_counts[w] = own
+
+    # integer keys for the position, kept up to date as tokens are placed and removed so the board never has to be read
+    # for each symmetry there is the state_key of the state string read in that symmetry's order, the key the q-tables use,
+    # and an order key - the same with the tokens' digits swapped, so comparing order keys compares the state strings
+    # all of them are packed into one integer, a field of key_bits bits each, so placing a token is a single addition
+    # no field ever goes above 3^cells - 1, so adding and taking away tokens never carries into the next field
+    def build_position_keys(self):
+        cells = len(self.symmetries[0][0])
+        count = len(self.symmetries)
+        self.key_bits = (3 ** cells - 1).bit_length()
+        self.key_mask = (1 << self.key_bits) - 1
+        weights = []
+        for order, _ in self.symmetries:
+            symmetry_weights = [0] * cells
+            for position, cell in enumerate(order):
+                symmetry_weights[cell] = 3 ** (cells - 1 - position)
+            weights.append(symmetry_weights)
+        # what placing each player's token in each cell of the state string adds to the packed keys
+        self.key_deltas = [[sum(w[cell] * (player + 1) << self.key_bits * s | w[cell] * (2 - player) << self.key_bits * (count + s)
+                                for s, w in enumerate(weights)) for cell in range(cells)] for player in range(2)]
+
+    def reset_position_keys(self):
+        self.packed_keys = 0
+
+    # add or take away a player's token in a cell of the state string
+    def add_key_token(self, player: int, cell: int):
+        self.packed_keys += self.key_deltas[player][cell]
+
+    def remove_key_token(self, player: int, cell: int):
+        self.packed_keys -= self.key_deltas[player][cell]
+
+    # the key of the current position, the same as state_key(self.get_state())
+    def position_key(self) -> int:
+        return self.packed_keys & self.key_mask
+
+    # the key of the canonical form of the current position and the index of the symmetry that produces it
+    # the same as canonical_state followed by state_key, without building any strings
+    def canonical_key(self) -> tuple[int, int]:
+        keys, bits, count = self.packed_keys, self.key_bits, len(self.symmetries)
+        order_keys = [keys >> bits * (count + s) & self.key_mask for s in range(count)]
+        symmetry = order_keys.index(min(order_keys))
+        return keys >> bits * symmetry & self.key_mask, symmetry
+
+    # map a state string to its canonical form - the smallest of its symmetric versions
+    # returns the canonical state and the index of the symmetry that produces it
+    # symmetric positions are equally good, so the q-learner only has to learn one of them
+    def canonical_state(self, state: str) -> tuple[str, int]:
+        best, best_symmetry = state, 0
+        for i in range(1, len(self.symmetries)):
+            candidate = "".join([state[j] for j in self.symmetries[i][0]])
+            if candidate < best:
+                best, best_symmetry = candidate, i
+        return best, best_symmetry
+
+    # map a move on the board to the same move in the orientation of the canonical state
+    def canonical_move(self, move: int, symmetry: int) -> int:
+        return self.symmetries[symmetry][1][move]
+
+    # map a move in the orientation of the canonical state back to the board - the reverse of canonical_move
+    def board_move(self, move: int, symmetry: int) -> int:
+        return next(m for m, canonical in self.symmetries[symmetry][1].items() if canonical == move)
+
+
+# the Connect4 board and rules
+class Connect4Kernel(Kernel):
+    state_tokens = "RB"
+
+    def __init__(self, board_size=(7, 6)):
+        self.width = board_size[0]
+        self.height = board_size[1]
+        self.columns = range(1, self.width + 1)
+
+        # the board is stored as a bitboard - one integer per player
+        # each column takes height + 1 bits, bit (col * (height + 1) + row) is set if the player has a token there
+        # the extra bit on top of each column is always empty so runs can't wrap from one column into the next
+        self.col_bits = self.height + 1
+        # the shifts that move a bit one cell along each direction: vertical, horizontal, diagonal (/) and diagonal (\)
+        self.shifts = (1, self.col_bits, self.col_bits + 1, self.col_bits - 1)
+        self.max_moves = self.width * self.height
+        # bitmasks of every window of 4 cells that could contain a winning run
+        # and for each bit, the indices of the windows it is part of - used to keep the window counts up to date
+        self.windows = []
+        self.cell_windows = [[] for _ in range(self.width * self.col_bits)]
+        for col in range(self.width):
+            for row in range(self.height):
+                start = col * self.col_bits + row
+                for shift, cols, rows in ((1, 0, 3), (self.col_bits, 3, 0), (self.col_bits + 1, 3, 3), (self.col_bits - 1, 3, -3)):
+                    if col + cols < self.width and 0 <= row + rows < self.height:
+                        for k in range(4):
+                            self.cell_windows[start + k * shift].append(len(self.windows))
+                        self.windows.append(sum(1 << (start + k * shift) for k in range(4)))
+        self.cell_windows = [tuple(windows) for windows in self.cell_windows]
+        # for each cell, a mask of the cells within 3 steps of it along the 4 lines through it
+        # any run of 4 that includes the cell is inside this mask
+        self.line_masks = {}
+        for col in range(self.width):
+            for row in range(self.height):
+                mask = 0
+                for cols, rows in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    for k in range(-3, 4):
+                        c, r = col + k * cols, row + k * rows
+                        if 0 <= c < self.width and 0 <= r < self.height:
+                            mask |= 1 << (c * self.col_bits + r)
+                self.line_masks[col * self.col_bits + row] = mask
+        # the symmetries of the board - it is the same position when mirrored left to right
+        # each is the order to read the state string in, and the move each column maps to
+        mirror = [row * self.width + self.width - 1 - col for row in range(self.height) for col in range(self.width)]
+        self.symmetries = [(list(range(self.max_moves)), {col: col for col in self.columns}),
+                           (mirror, {col: self.width + 1 - col for col in self.columns})]
+        # zobrist keys for each player and bit, used to hash the board for the transposition table
+        self.zobrist = zobrist_keys(self.width * self.col_bits)
+        self.build_position_keys()
+        self.build_move_lists(self.width)
+        self.reset()
+
+    @override
+    def reset(self):
+        self.boards = [0, 0]
+        self.hash = 0
+        # number of tokens in each column, and a bit for each column that isn't full
+        self.heights = [0] * self.width
+        self.legal = (1 << self.width) - 1
+        # the state string is kept up to date as tokens are placed, so get_state doesn't need to scan the board
+        self.state_chars = [" "] * (self.width * self.height)
+        self.reset_window_counts(len(self.windows), 4)
+        self.reset_position_keys()
+        self.move_history = []
+
+    # place a token on top of the column
+    @override
+    def place(self, col: int, player: int):
+        row = self.heights[col - 1]
+        if row == self.height:
+            return
+        bit = (col - 1) * self.col_bits + row
+        self.boards[player] |= 1 << bit
+        self.hash ^= self.zobrist[player][bit]
+        self.heights[col - 1] = row + 1
+        if row + 1 == self.height:
+            self.legal ^= 1 << (col - 1)
+        self.state_chars[row * self.width + col - 1] = "RB"[player]
+        self.add_window_token(player, self.cell_windows[bit])
+        self.add_key_token(player, row * self.width + col - 1)
+        self.move_history.append(col)
+
+    # set the board up from a state string
+    # the rows are filled from the bottom, so every token lands where the state has it
+    # the move history is in that order rather than the order the moves were made
+    @override
+    def set_state(self, state: str):
+        self.reset()
+        for i, char in enumerate(state):
+            if char != " ":
+                self.place(i % self.width + 1, "RB".index(char))
+
+    # remove the top token from a column
+    @override
+    def remove_token(self, col):
+        row = self.heights[col - 1] - 1
+        if row < 0:
+            return
+        bit = (col - 1) * self.col_bits + row
+        player = 0 if self.boards[0] >> bit & 1 else 1
+        self.boards[player] ^= 1 << bit
+        self.hash ^= self.zobrist[player][bit]
+        self.heights[col - 1] = row
+        self.legal |= 1 << (col - 1)
+        self.state_chars[row * self.width + col - 1] = " "
+        self.remove_window_token(player, self.cell_windows[bit])
+        self.remove_key_token(player, row * self.width + col - 1)
+        self.move_history.pop()
+
+    # columns closer to the centre are part of more possible runs, so are searched first
+    @override
+    def get_move_priority(self) -> dict[int, int]:
+        return {col: -abs(2 * col - self.width - 1) for col in self.columns}
+
+    # the token goes on top of the column
+    @override
+    def move_cell(self, col: int) -> int:
+        return self.heights[col - 1] * self.width + col - 1
+
+    # get the state of the board as a string
+    # tokens are stored as R, B and " ", row by row from the bottom
+    @override
+    def get_state(self) -> str:
+        return "".join(self.state_chars)
+
+    # a player has won if one of the windows is full of their tokens
+    @override
+    def has_won(self, player: int) -> bool:
+        return self.run_counts[player][4] > 0
+
+    # check if the last token placed completed a run of 4
+    # only the lines through that token are checked, on the board of the player who placed it
+    @override
+    def check_last_win(self) -> bool:
+        if not self.move_history:
+            return False
+        col = self.move_history[-1] - 1
+        bit = col * self.col_bits + self.heights[col] - 1
+        board = self.boards[0] if self.boards[0] >> bit & 1 else self.boards[1]
+        return self.has_four(board & self.line_masks[bit])
+
+    # check if a bitboard contains 4 in a row
+    # for each direction, and-ing the board with itself shifted by one cell leaves the starts of runs of 2
+    # doing the same again with a shift of two cells leaves the starts of runs of 4
+    def has_four(self, board: int) -> bool:
+        for shift in self.shifts:
+            pairs = board & (board >> shift)
+            if pairs & (pairs >> 2 * shift):
+                return True
+        return False
+
+    # count the number of runs of a player of a certain length
+    # a run a sequence of 4 tokens containing only the player's tokens and blanks
+    # a run of 3 is one move away from winning
+    # the runs are counted as tokens are placed and removed, so this is a lookup
+    def runs(self, player: int, threshold: int) -> int:
+        return self.run_counts[player][threshold]
+
+    # count the number of runs of 3 and 2 for the player and opponent
+    # return the difference between the two, with runs of 3 worth 4 times as much as runs of 2
+    @override
+    def evaluate(self, player: int) -> int:
+        own, other = self.run_counts[player], self.run_counts[1 - player]
+        return own[3] * 4 + own[2] - other[3] * 4 - other[2]
+
+    @override
+    def algorithm_move(self, player: int) -> int:
+        # first check if the player can win in the next move - if so, return that move
+        # then check if the opponent can win in the next move - if so, block that move
+        remaining_columns = self.get_remaining_moves()
+        for p in [player, 1 - player]:
+            for col in remaining_columns:
+                self.place(col, p)
+                win = self.check_last_win()
+                self.remove_token(col)
+                if win:
+                    return col
+
+        # if no winning moves, find the move that results in the most runs of 3 - i.e. runs one move away from winning
+        # next, find the move that results in the most runs of 2
+        runs = self.run_counts[player]
+        for threshold in [3, 2]:
+            baseline = runs[threshold]
+            highest_wins = ([], baseline)
+            for col in remaining_columns:
+                self.place(col, player)
+                wins = runs[threshold]
+                self.remove_token(col)
+                if wins > highest_wins[1]:
+                    highest_wins = ([col], wins)
+                elif wins == highest_wins[1]:
+                    highest_wins[0].append(col)
+            if highest_wins[1] > baseline:
+                return random.choice(highest_wins[0])
+        # if no runs of 3 or 2, choose randomly
+        return random.choice(remaining_columns)
+
+
+# the TicTacToe board and rules
+class TicTacToeKernel(Kernel):
+    max_moves = 9
+    state_tokens = "XO"
+    # the indices of all subsets that could contain a winning run
+    winning_subsets = [[0, 1, 2], [3, 4, 5], [6, 7, 8], [0, 3, 6], [1, 4, 7], [2, 5, 8], [0, 4, 8], [2, 4, 6]]
+    # the rotations and reflections of the board, mapping (row, column) to the new (row, column)
+    transforms = [lambda r, c: (r, c), lambda r, c: (c, 2 - r), lambda r, c: (2 - r, 2 - c), lambda r, c: (2 - c, r),
+                  lambda r, c: (r, 2 - c), lambda r, c: (2 - r, c), lambda r, c: (c, r), lambda r, c: (2 - c, 2 - r)]
+
+    def __init__(self):
+        # the 8 symmetries of the board - rotations and reflections
+        # each is the order to read the state string in, and the cell each move maps to
+        self.symmetries = []
+        for transform in self.transforms:
+            cell_map = [transform(i // 3, i % 3) for i in range(9)]
+            order = [0] * 9
+            for i, (row, col) in enumerate(cell_map):
+                order[row * 3 + col] = i
+            self.symmetries.append((order, {i + 1: row * 3 + col + 1 for i, (row, col) in enumerate(cell_map)}))
+        # zobrist keys for each player and cell, used to hash the board for the transposition table
+        self.zobrist = zobrist_keys(9)
+        # the winning subsets that contain each cell, and their indices, used to keep the subset counts up to date
+        self.cell_subsets = [[subset for subset in self.winning_subsets if i in subset] for i in range(9)]
+        self.cell_subset_indices = [[s for s, subset in enumerate(self.winning_subsets) if i in subset] for i in range(9)]
+        self.build_position_keys()
+        self.build_move_lists(9)
+        self.reset()
+
+    @override
+    def reset(self):
+        # the board is a list of 9 cells, each X, O or blank as in the state string
+        self.cells = [" "] * 9
+        # a bit for each cell that is still blank
+        self.legal = (1 << 9) - 1
+        self.move_history = []
+        self.hash = 0
+        self.reset_window_counts(len(self.winning_subsets), 3)
+        self.reset_position_keys()
+
+    # the centre is part of 4 winning subsets, corners 3 and edges 2
+    @override
+    def get_move_priority(self) -> dict[int, int]:
+        return {i + 1: len(subsets) for i, subsets in enumerate(self.cell_subsets)}
+
+    @override
+    def move_cell(self, index: int) -> int:
+        return index - 1
+
+    # place a token in a cell
+    # as the game is played with the numpad (keys 1-9), the index is 1 less than the key
+    @override
+    def place(self, index: int, player: int):
+        self.cells[index - 1] = "XO"[player]
+        self.hash ^= self.zobrist[player][index - 1]
+        self.legal ^= 1 << (index - 1)
+        self.add_window_token(player, self.cell_subset_indices[index - 1])
+        self.add_key_token(player, index - 1)
+        self.move_history.append(index)
+
+    # set the board up from a state string
+    # the move history is in cell order rather than the order the moves were made
+    @override
+    def set_state(self, state: str):
+        self.reset()
+        for i, char in enumerate(state):
+            if char != " ":
+                self.place(i + 1, "XO".index(char))
+
+    # remove a token from a cell
+    @override
+    def remove_token(self, index):
+        player = "XO".index(self.cells[index - 1])
+        self.hash ^= self.zobrist[player][index - 1]
+        self.remove_window_token(player, self.cell_subset_indices[index - 1])
+        self.remove_key_token(player, index - 1)
+        self.cells[index - 1] = " "
+        self.legal |= 1 << (index - 1)
+        self.move_history.pop()
+
+    # get the state of the board as a string
+    @override
+    def get_state(self):
+        return "".join(self.cells)
+
+    # a player has won if one of the winning subsets is full of their tokens
+    @override
+    def has_won(self, player: int) -> bool:
+        return self.run_counts[player][3] > 0
+
+    # check if the last token placed completed a winning subset
+    # only the subsets containing the last cell are checked
+    @override
+    def check_last_win(self) -> bool:
+        if not self.move_history:
+            return False
+        index = self.move_history[-1] - 1
+        token = self.cells[index]
+        return any(all(self.cells[i] == token for i in subset) for subset in self.cell_subsets[index])
+
+    # count the number of winning subsets that contain 2 of the player's tokens and 1 blank cell
+    # the subsets are counted as tokens are placed and removed, so this is a lookup
+    def doubles(self, player: int) -> int:
+        return self.run_counts[player][2]
+
+    # the difference between the player's and the opponent's doubles
+    @override
+    def evaluate(self, player: int) -> int:
+        return self.run_counts[player][2] - self.run_counts[1 - player][2]
+
+    @override
+    def algorithm_move(self, player: int) -> int:
+        # first check if the player can win in the next move - if so, return that move
+        # then check if the opponent can win in the next move - if so, block that move
+        remaining_cells = self.get_remaining_moves()
+        for p in [player, 1 - player]:
+            for cell in remaining_cells:
+                self.place(cell, p)
+                win = self.check_last_win()
+                self.remove_token(cell)
+                if win:
+                    return cell
+
+        # if no winning moves, find the move that results in the most doubles - i.e. runs one move away from winning
+        highest_count = ([], 0)
+        for cell in remaining_cells:
+            self.place(cell, player)
+            count = self.run_counts[player][2]
+            self.remove_token(cell)
+            if count > highest_count[1]:
+                highest_count = ([cell], count)
+            elif count == highest_count[1]:
+                highest_count[0].append(cell)
+        if highest_count[1] > 0:
+            return random.choice(highest_count[0])
+        # if no doubles, choose randomly
+        return random.choice(remaining_cells)
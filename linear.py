@@ -0,0 +1,212 @@
+import os
+import random
+import struct
+import time
+from typing import override
+import numpy as np
+from tqdm import trange
+from qlearner import QLearner
+from util import Parameters
+from vecenv import window_cells
+
+# header of a weight file - magic, number of windows, cells per window
+weights_header = struct.Struct("<4sII")
+weights_magic = b"LIN1"
+
+
+# linear value function over the windows of the board
+# each window's cells are read as a number in base 3 from the point of view of the player who just moved -
+# 0 for blank, 1 for their own token, 2 for the opponent's - and every window has a weight for each of these patterns
+# the value of a position is the sum of its windows' weights, so the number of weights is fixed by the board size,
+# not by the number of positions seen, and looking up a move costs the same however long the model was trained
+class LinearModel:
+    def __init__(self, windows: np.ndarray, weights: np.ndarray = None):
+        self.windows = windows
+        self.patterns = 3 ** windows.shape[1]
+        self.powers = 3 ** np.arange(windows.shape[1] - 1, -1, -1)
+        # the weights are one flat array, with each window's patterns in a block of their own
+        self.offsets = np.arange(len(windows)) * self.patterns
+        self.weights = np.zeros(len(windows) * self.patterns, dtype=np.float32) if weights is None else weights
+        # the value each character of the state string has for each player
+        self.codes = None
+
+    # the cell values of each state string character, for each player
+    def set_codes(self, state_tokens: str):
+        self.codes = np.zeros((2, 256), dtype=np.int8)
+        for player in range(2):
+            self.codes[player, ord(state_tokens[player])] = 1
+            self.codes[player, ord(state_tokens[1 - player])] = 2
+
+    # the weight index of each window's pattern, for a batch of boards in cell values
+    def features(self, boards: np.ndarray) -> np.ndarray:
+        return boards[:, self.windows] @ self.powers + self.offsets
+
+    # the values of the positions with the given features
+    def values(self, features: np.ndarray) -> np.ndarray:
+        return self.weights[features].sum(axis=1)
+
+    # the legal moves of the player to move and the features of the position after each of them
+    def afterstates(self, game, player: int) -> tuple[list[int], np.ndarray]:
+        if self.codes is None:
+            self.set_codes(game.state_tokens)
+        board = self.codes[player][np.frombuffer(game.get_state().encode(), dtype=np.uint8)]
+        moves = game.get_remaining_moves()
+        boards = np.repeat(board[None], len(moves), axis=0)
+        boards[np.arange(len(moves)), [game.move_cell(move) for move in moves]] = 1
+        return moves, self.features(boards)
+
+    # choose the move leading to the position with the highest value, breaking ties randomly
+    def choose_move(self, game, player: int) -> int:
+        moves, features = self.afterstates(game, player)
+        values = self.values(features)
+        return random.choice([m for m, v in zip(moves, values) if v == values.max()])
+
+    # one step of gradient descent on the mean squared error of a mini-batch of positions
+    # each position's error is shared equally between its windows' weights
+    # the errors are averaged over the mini-batch, as common patterns such as empty windows are in nearly every position
+    def update(self, features: np.ndarray, targets: np.ndarray, alpha: float):
+        errors = targets - self.values(features)
+        step = np.repeat(errors * (alpha / features.size), features.shape[1])
+        self.weights += np.bincount(features.ravel(), step, len(self.weights)).astype(np.float32)
+
+    # save the weights to a file, which is the same size however long the model was trained
+    def save(self, file_name: str):
+        with open(file_name, "wb") as file:
+            file.write(weights_header.pack(weights_magic, *self.windows.shape))
+            file.write(self.weights.astype("<f4").tobytes())
+
+    # load a model for a board from a weight file
+    @classmethod
+    def load(cls, file_name: str, windows: np.ndarray):
+        with open(file_name, "rb") as file:
+            magic, count, size = weights_header.unpack(file.read(weights_header.size))
+            if magic != weights_magic or (count, size) != windows.shape:
+                raise ValueError(f"{file_name} is not a weight file for this board")
+            weights = np.frombuffer(file.read(), dtype="<f4").astype(np.float32)
+        return cls(windows, weights)
+
+
+# load the linear models for both players of a game
+# as with q-tables, models saved under another name are loaded from q_tables/<name>_first.lin and _second.lin
+def load_linear_models(game, size="", name=None) -> dict:
+    prefix = f"{name}_" if name is not None else f"{game.__class__.__name__}_{size}"
+    windows = window_cells(game)
+    models = {}
+    for token, order in zip(game.get_tokens(), ("first", "second")):
+        file_name = f"q_tables/{prefix}{order}.lin"
+        if not os.path.exists(file_name):
+            print(f"The linear learner has not been trained for {prefix}{order}.")
+            exit()
+        models[token] = LinearModel.load(file_name, windows)
+    return models
+
+
+# trains a linear model of the value of positions, for boards too large to keep a q-table for
+# the agent plays the move leading to the position its model values highest, and after each game the positions it
+# moved into are given the final reward, discounted for earlier moves, as their target value
+# the targets are collected in a fixed-size buffer and the model is updated a mini-batch at a time
+class LinearLearner(QLearner):
+    def __init__(self, game, batches: int, batch_size: int, seed: int, mini_batch: int = 256):
+        random.seed(seed)
+        print("Seed:", seed)
+
+        self.game = game
+        self.windows = window_cells(game)
+        self.model = LinearModel(self.windows)
+        self.batches = batches
+        self.batch_size = batch_size
+        self.seed = seed
+        self.stats = None
+        self.gamma = 0.95
+        # the features and targets waiting for the next update, preallocated so memory doesn't grow with training
+        self.mini_batch = mini_batch
+        self.features = np.zeros((mini_batch, len(self.windows)), dtype=np.int64)
+        self.targets = np.zeros(mini_batch, dtype=np.float32)
+        self.pending = 0
+        self.set_rates(0)
+
+    @override
+    def reset(self):
+        self.model = LinearModel(self.windows)
+        self.pending = 0
+        self.set_rates(0)
+
+    # the updates are averaged over a mini-batch, so the learning rate is much higher than the q-table's
+    # the agent explores less, as the opponent's random moves already spread the positions it sees
+    @override
+    def set_rates(self, episodes: int):
+        self.alpha = max(0.2, 2.0 * 0.99999 ** episodes)
+        self.epsilon = max(0.05, 0.3 * 0.99999 ** episodes)
+
+    # add the positions of a game to the buffer, updating the model each time it fills
+    def add_targets(self, features: list[np.ndarray], final_reward: float):
+        for position in reversed(features):
+            self.features[self.pending] = position
+            self.targets[self.pending] = final_reward
+            self.pending += 1
+            if self.pending == self.mini_batch:
+                self.model.update(self.features, self.targets, self.alpha)
+                self.pending = 0
+            final_reward *= self.gamma
+
+    @override
+    def play_episode(self, params: Parameters):
+        game = self.game
+        agent = 0 if params.goes_first else 1
+        history = []
+        done = False
+        reward = 0
+        while not done:
+            player = game.to_move()
+            if player == agent:
+                # the agent explores with a random move, or plays the move its model values highest
+                moves, features = self.model.afterstates(game, player)
+                if random.uniform(0, 1) < self.epsilon:
+                    i = random.randrange(len(moves))
+                else:
+                    values = self.model.values(features)
+                    i = random.choice(np.flatnonzero(values == values.max()))
+                history.append(features[i])
+                move = moves[i]
+            elif random.uniform(0, 1) < 0.5:
+                # opponent chooses a move randomly half of the time and algorithmically the other half
+                move = random.choice(game.get_remaining_moves())
+            else:
+                move = game.algorithm_move(player)
+            _, reward, done = game.step(move)
+
+        # the rewards are scaled so the targets are between -1 and 1
+        agent_won = player == agent if reward else None
+        scale = max(abs(params.win_reward), abs(params.loss_reward))
+        self.add_targets(history, self.final_reward(params, agent_won, len(game.move_history)) / scale)
+        game.reset()
+
+    # train in batches, testing the agent against the algo player after each one like the q-learner
+    @override
+    def train_once(self, params: Parameters):
+        print("Training agent that goes first" if params.goes_first else "Training agent that goes second")
+        agent = self.game.get_tokens()[0 if params.goes_first else 1]
+        for i in range(1, self.batches + 1):
+            first_episode = (i - 1) * self.batch_size
+            batch_start = time.perf_counter()
+            for e in trange(first_episode, first_episode + self.batch_size):
+                self.set_rates(e)
+                self.play_episode(params)
+            if self.stats is not None:
+                self.stats.count("episodes", self.batch_size)
+                self.stats.record_batch(self.batch_size, time.perf_counter() - batch_start, len(self.model.weights), self.model.weights.nbytes)
+
+            self.game.linear_models[agent] = self.model
+            print(f"Total episodes: {i * self.batch_size}")
+            stats = [0, 0, 0]
+            testing_games = 1000
+            for j in range(testing_games):
+                winner = self.game.play(not params.goes_first)
+                self.game.reset()
+                stats[winner] += 1
+            print(f"Wins: {stats[0]} | Losses: {stats[1]} | Draws: {stats[2]}")
+            if stats[1] <= testing_games * params.loss_threshold and stats[2] <= testing_games * params.draw_threshold:
+                break
+
+        os.makedirs("q_tables", exist_ok=True)
+        self.model.save(f"{self.get_file_name(params.goes_first)}.lin")
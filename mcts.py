@@ -0,0 +1,188 @@
+import copy
+import math
+import random
+import time
+from multiprocessing import Pool
+
+# the copy of the game each rollout worker plays out positions with
+worker_game = None
+
+
+# a position in the search tree
+# the score is from the point of view of the player who made the move into the position - 1 for each win, 0.5 for each draw
+# result is set if the game is over at this position, as the score a visit to it is worth
+class Node:
+    __slots__ = ("move", "player", "children", "untried", "visits", "score", "result")
+
+    def __init__(self, move, player: int, untried: list[int], result: float | None = None):
+        self.move = move
+        self.player = player
+        self.children = []
+        # the moves that haven't been expanded yet, in a random order
+        random.shuffle(untried)
+        self.untried = untried
+        self.visits = 0
+        self.score = 0.0
+        self.result = result
+
+
+# play the game out from the current position with the game's algorithm choosing every move, then put the board back
+# returns the player that won, or None for a draw
+def rollout(game) -> int | None:
+    played = 0
+    winner = None
+    while True:
+        player = game.to_move()
+        game.place(game.algorithm_move(player), player)
+        played += 1
+        if game.check_last_win():
+            winner = player
+            break
+        if not game.legal_mask():
+            break
+    for _ in range(played):
+        game.remove_token(game.move_history[-1])
+    return winner
+
+
+# set up a rollout worker process with its own copy of the game
+def init_rollout_worker(game):
+    global worker_game
+    worker_game = game
+
+
+# play out a position in a worker process, reached by playing the given moves from the empty board
+def rollout_task(moves: list[int]) -> int | None:
+    game = worker_game
+    game.reset()
+    for move in moves:
+        game.step(move)
+    return rollout(game)
+
+
+# monte carlo tree search with UCT selection
+# each playout walks down the tree picking the child with the best upper confidence bound, adds one new position,
+# plays the game out from it with the game's algorithm and adds the result to every position on the way back up
+# the cost of a move is set by the number of playouts or the time budget, not by the size of the board
+# the tree is kept between moves, and the subtree for the position after the opponent's reply is searched from next time
+# with more than one worker, each new position is played out once in each worker process
+class MCTS:
+    # weight of the exploration term in the upper confidence bound
+    exploration = math.sqrt(2)
+
+    def __init__(self, game, workers: int = 1):
+        self.game = game
+        self.root = None
+        # the moves played to reach the root, so the tree can be reused if the game has carried on from it
+        self.root_history = []
+        self.workers = workers
+        self.pool = None
+        if workers > 1:
+            # the workers get a copy of the game without the parts they don't need
+            worker_copy = copy.copy(game)
+            worker_copy.tt = None
+            worker_copy.parallel = None
+            worker_copy.mcts = None
+            worker_copy.q_tables = {}
+            worker_copy.linear_models = {}
+            worker_copy.visualise = False
+            self.pool = Pool(workers, initializer=init_rollout_worker, initargs=(worker_copy,))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+
+    # find the tree for the game's current position
+    # if the game carried on from the last root, the subtree for the moves played since is used, otherwise a new tree is started
+    def find_root(self) -> Node:
+        game = self.game
+        history = game.move_history
+        node = self.root
+        if node is not None and history[:len(self.root_history)] == self.root_history:
+            for move in history[len(self.root_history):]:
+                node = next((child for child in node.children if child.move == move), None)
+                if node is None:
+                    break
+        else:
+            node = None
+        if node is None:
+            node = Node(history[-1] if history else None, 1 - game.to_move(), game.get_remaining_moves())
+        self.root = node
+        self.root_history = list(history)
+        return node
+
+    # the child with the highest upper confidence bound
+    def select(self, node: Node) -> Node:
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.children, key=lambda child: child.score / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+    # run one playout from the root, returning the number of games played out
+    # the board is put back to the root position afterwards
+    def playout(self, root: Node) -> int:
+        game = self.game
+        node = root
+        path = [root]
+        # walk down the tree until a position with moves left to expand, or the end of the game
+        while node.result is None and not node.untried:
+            node = self.select(node)
+            game.place(node.move, node.player)
+            path.append(node)
+        # add one of the unexpanded moves to the tree
+        if node.result is None:
+            move = node.untried.pop()
+            player = 1 - node.player
+            game.place(move, player)
+            if game.check_last_win():
+                result = 1.0
+            elif not game.legal_mask():
+                result = 0.5
+            else:
+                result = None
+            child = Node(move, player, game.get_remaining_moves() if result is None else [], result)
+            node.children.append(child)
+            node = child
+            path.append(node)
+
+        # the score of the new position for the player who moved into it
+        games = 1
+        if node.result is not None:
+            score = node.result
+        elif self.pool is not None:
+            moves = game.move_history[:]
+            winners = self.pool.map(rollout_task, [moves] * self.workers)
+            games = len(winners)
+            score = sum(1.0 if winner == node.player else 0.5 if winner is None else 0.0 for winner in winners)
+        else:
+            winner = rollout(game)
+            score = 1.0 if winner == node.player else 0.5 if winner is None else 0.0
+        for _ in range(len(path) - 1):
+            game.remove_token(game.move_history[-1])
+
+        # each position is scored for the player who moved into it, so the score flips at each level
+        for node in reversed(path):
+            node.visits += games
+            node.score += score
+            score = games - score
+        return games
+
+    # search from the game's current position and return the most visited move
+    # the search stops after the game's number of playouts, or when the time budget runs out if there is one
+    def choose_move(self) -> int:
+        game = self.game
+        root = self.find_root()
+        reused = root.visits
+        deadline = time.perf_counter() + game.time_budget if game.time_budget is not None else None
+        played = 0
+        while True:
+            played += self.playout(root)
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    break
+            elif played >= game.playouts:
+                break
+        game.nodes += played
+        if game.stats is not None:
+            game.stats.count("mcts playouts", played)
+            game.stats.count("mcts reused visits", reused)
+        return max(root.children, key=lambda child: child.visits).move
@@ -0,0 +1,92 @@
+# move ordering for minimax with alpha-beta pruning
+# alpha-beta cuts off more of the tree the sooner it finds the best move at each node,
+# so the moves most likely to be good are searched first
+
+
+# searches the moves in the order the game returns them
+class MoveOrdering:
+    def __init__(self, game):
+        self.game = game
+
+    # called at the start of each search
+    def new_search(self):
+        pass
+
+    # return the moves in the order they should be searched
+    # best_move is the best move stored in the transposition table for the position, if there is one
+    def order(self, moves: list[int], depth: int, token: str, best_move=None) -> list[int]:
+        return self.best_move_first(moves, best_move)
+
+    # the move stored in the transposition table is always searched first
+    @staticmethod
+    def best_move_first(moves: list[int], best_move) -> list[int]:
+        if best_move in moves:
+            moves.remove(best_move)
+            moves.insert(0, best_move)
+        return moves
+
+    # called when a move causes an alpha-beta cutoff
+    def record_cutoff(self, move: int, depth: int, token: str, remaining_depth: int):
+        pass
+
+
+# searches the moves in a fixed order based on how good they usually are
+# e.g. centre columns in Connect4, as they are part of the most possible runs
+class StaticOrdering(MoveOrdering):
+    def __init__(self, game):
+        super().__init__(game)
+        self.priority = game.get_move_priority()
+
+    def order(self, moves: list[int], depth: int, token: str, best_move=None) -> list[int]:
+        moves.sort(key=self.priority.__getitem__, reverse=True)
+        return self.best_move_first(moves, best_move)
+
+
+# adds the killer move and history heuristics on top of the static order
+# killer moves are the last moves that caused a cutoff at the same depth - a move that refutes one line often refutes its siblings
+# the history score of a move is increased every time it causes a cutoff anywhere in the search, weighted by the depth below it
+# killers are searched first, the history score breaks ties between moves with the same static priority
+# letting history override the static order was found to search more nodes in Connect4
+class KillerHistoryOrdering(StaticOrdering):
+    killer_slots = 2
+
+    def __init__(self, game):
+        super().__init__(game)
+        self.new_search()
+
+    # killers and history are kept for the whole of a search and reset before the next one
+    def new_search(self):
+        self.killers = [[] for _ in range(self.game.max_moves + 1)]
+        self.history = {token: {move: 0 for move in self.priority} for token in self.game.get_tokens()}
+
+    def order(self, moves: list[int], depth: int, token: str, best_move=None) -> list[int]:
+        killers = self.killers[depth]
+        history = self.history[token]
+        priority = self.priority
+        moves.sort(key=lambda move: (move in killers, priority[move], history[move]), reverse=True)
+        return self.best_move_first(moves, best_move)
+
+    def record_cutoff(self, move: int, depth: int, token: str, remaining_depth: int):
+        killers = self.killers[depth]
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[self.killer_slots:]
+        self.history[token][move] += remaining_depth * remaining_depth
+
+
+# the move orderings that can be chosen from the command line
+orderings = {"none": MoveOrdering, "static": StaticOrdering, "killer": KillerHistoryOrdering}
+
+
+# count the nodes minimax with alpha-beta pruning searches from the current position with each move ordering
+# used to report how many nodes the ordering saves
+def compare_orderings(game) -> dict[str, int]:
+    original = game.ordering
+    nodes = {}
+    for name, ordering in orderings.items():
+        game.ordering = ordering(game)
+        game.nodes = 0
+        game.minimax_choose_move(float("-inf"), float("inf"))
+        nodes[name] = game.nodes
+    game.ordering = original
+    return nodes
@@ -0,0 +1,111 @@
+import copy
+import time
+from multiprocessing import Pool, Value
+
+from transposition import TranspositionTable
+from util import SearchTimeout
+
+# the copy of the game each worker process searches with
+worker_game = None
+
+
+# set up a worker process with its own copy of the game and transposition table
+# shared_alpha is the best score found at the root by any worker, so the others can cut off moves that can't beat it
+def init_worker(game, shared_alpha, tt_memory):
+    global worker_game
+    worker_game = game
+    worker_game.shared_alpha = shared_alpha
+    worker_game.tt = TranspositionTable(tt_memory) if tt_memory else None
+    worker_game.search_id = None
+
+
+# search a single root move in a worker process
+# the worker's board is brought up to the root position by replaying the moves of the game
+# the deadline is the parent's, as perf_counter uses the monotonic clock, which is the same in every process
+# so moves queued behind others don't get the whole budget again, and are skipped once it has run out
+def search_move(task):
+    search_id, history, move, search_depth, pruning, beta, deadline = task
+    if deadline is not None and time.perf_counter() > deadline:
+        return move, None, False
+    game = worker_game
+    if game.search_id != search_id:
+        game.search_id = search_id
+        game.reset()
+        for i, m in enumerate(history):
+            game.place_token(m, game.get_tokens()[i % 2])
+        game.current_token = game.get_tokens()[len(history) % 2]
+        if game.tt is not None:
+            game.tt.new_search()
+        game.ordering.new_search()
+
+    player = game.current_token
+    opponent = game.get_other(player)
+    game.search_depth = search_depth
+    game.deadline = deadline
+    alpha = game.shared_alpha.value if pruning else None
+
+    game.place_token(move, player)
+    try:
+        score = game.minimax(player, opponent, 0, False, alpha, beta)
+    except SearchTimeout:
+        game.undo_moves(len(history))
+        return move, None, False
+    game.remove_token(move)
+
+    # raise the shared alpha if this move is the best so far
+    # only the move that raised it to its final value is known to have that exact score,
+    # the others may have stopped as soon as they were shown to be no better
+    improved = False
+    if pruning:
+        with game.shared_alpha.get_lock():
+            if score > game.shared_alpha.value:
+                game.shared_alpha.value = score
+                improved = True
+    return move, score, improved
+
+
+# searches the root moves of minimax in parallel, one move per task, over a pool of worker processes
+class ParallelSearch:
+    def __init__(self, game, workers: int):
+        self.game = game
+        self.shared_alpha = Value("d", float("-inf"))
+        # the workers get a copy of the game without the parts they don't need
+        # the memory cap of the transposition table is split between them
+        worker_copy = copy.copy(game)
+        worker_copy.tt = None
+        worker_copy.parallel = None
+        worker_copy.q_tables = {}
+        worker_copy.linear_models = {}
+        worker_copy.visualise = False
+        worker_copy.ordering = type(game.ordering)(worker_copy)
+        tt_memory = game.tt.memory / workers if game.tt is not None else 0
+        self.pool = Pool(workers, initializer=init_worker, initargs=(worker_copy, self.shared_alpha, tt_memory))
+
+    # search each move at the root, returning the best move and whether every move was searched
+    # if the time budget runs out, the best move is only returned if the first move finished, as with the serial search
+    def search_root(self, moves: list[int], alpha, beta) -> tuple[int | None, bool]:
+        game = self.game
+        pruning = alpha is not None
+        self.shared_alpha.value = alpha if pruning else float("-inf")
+        tasks = [(game.search_id, game.move_history, move, game.search_depth, pruning, beta, game.deadline) for move in moves]
+
+        scores = {}
+        best_move, best_score = None, float("-inf")
+        for move, score, improved in self.pool.imap_unordered(search_move, tasks):
+            if score is None:
+                continue
+            scores[move] = score
+            # with pruning, the best move is the one that raised the shared alpha the highest
+            if improved and score > best_score:
+                best_move, best_score = move, score
+        if not pruning:
+            # without pruning every score is exact, so ties go to the first move in the search order
+            best_move = max((m for m in moves if m in scores), key=scores.get, default=None)
+
+        complete = len(scores) == len(moves)
+        if not complete and moves[0] not in scores:
+            best_move = None
+        return best_move, complete
+
+    def close(self):
+        self.pool.terminate()
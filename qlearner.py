@@ -1,56 +1,119 @@
 import json
+import os
 import pickle
 import random
-from tqdm import trange
+import time
+from itertools import islice
+from multiprocessing import Pool
+import numpy as np
+from tqdm import tqdm, trange
+from evaluation import evaluate
+from qtable import default_q, new_q_table, state_key
+from replay import ReplayBuffer
 from util import Parameters
+from vecenv import VecEnv
 
-# default q value for states
-default_q = 0.0
+# the learner each training worker process plays episodes with
+worker_learner = None
+
+
+# set up a training worker process
+# with the fork start method the learner and its q-table are shared copy-on-write rather than copied
+def init_training_worker(learner):
+    global worker_learner
+    worker_learner = learner
+
+
+# play a share of a batch's episodes in a worker process, starting from the learner's q-table at the start of the batch
+# each worker seeds itself from the training seed and its first episode, and sets the learning and exploration rates
+# for each episode from its number, so the results are the same for a given seed and number of workers
+# returns the rows of the q-table the worker changed, and the moves it added to the replay buffer if there is one
+def play_worker_episodes(task):
+    params, first_episode, episodes = task
+    learner = worker_learner
+    random.seed(f"{learner.seed}-{params.goes_first}-{first_episode}")
+    replay_start = 0
+    if learner.replay is not None:
+        learner.replay.rng = np.random.default_rng([learner.seed, params.goes_first, first_episode])
+        replay_start = learner.replay.added
+    learner.q_table.changed = set()
+    for episode in range(first_episode, first_episode + episodes):
+        learner.set_rates(episode)
+        learner.play_episode(params)
+    entries = learner.replay.entries_since(replay_start) if learner.replay is not None else None
+    return {key: learner.q_table.key_row(key) for key in learner.q_table.changed}, entries
 
 
 # handles all the logic for training a q-learning agent
 class QLearner:
-    def __init__(self, game, batches: int, batch_size: int, seed: int):
+    def __init__(self, game, batches: int, batch_size: int, seed: int, workers: int = 1, boards: int = 1,
+                 checkpoint_every: int = 1, resume: bool = False, replay: ReplayBuffer = None):
         random.seed(seed)
         print("Seed:", seed)
 
-        self.q_table = {} # state: (move: q_value)
         self.game = game
+        self.q_table = new_q_table(game.__class__.__name__, self.get_width())
         self.batches = batches
         self.batch_size = batch_size
-        self.alpha = 0.1
+        self.seed = seed
+        # number of processes to play the episodes of each batch with
+        self.workers = workers
+        # number of games to play at once on the vectorised environment, if more than 1
+        self.env = VecEnv(game, boards, seed) if boards > 1 else None
+        # number of batches between checkpoints, and whether to carry on from the last checkpoint
+        self.checkpoint_every = checkpoint_every
+        self.resume = resume
+        # the number of rows of the q-table, and of moves added to the replay buffer, already written to a checkpoint
+        self.saved_rows = 0
+        self.saved_replay = 0
+        # buffer of past moves to replay a batch of after each episode, if there is one
+        self.replay = replay
+        # counters and timers for training, only recorded if turned on with -stats
+        self.stats = None
         self.gamma = 0.95
-        self.epsilon = 0.95
+        self.set_rates(0)
 
     # reset the q-table, learning rate and exploration rate
     def reset(self):
-        self.q_table = {}
-        self.alpha = 0.1
-        self.epsilon = 0.95
-
-    # get the available moves from the string state
-    def get_moves_from_state(self, state: str) -> list[int]:
-        # if the game is connect4, the available moves is based on the top row
-        if self.game.__class__.__name__ == "Connect4":
-            top_row_index = self.game.width * (self.game.height-1)
-            state = state[top_row_index:]
-        return [i for i, char in enumerate(state, 1) if char == " "]
-
-    # get the q-value for a state and move
-    # if the state or move is not in the q-table, add it with the default q-value
-    def get_q_value(self, state, move):
-        if state not in self.q_table:
-            self.q_table[state] = {m: default_q for m in self.game.get_remaining_moves()}
-        if move not in self.q_table[state]:
-            self.q_table[state][move] = default_q
-        return self.q_table[state][move]
+        self.q_table = new_q_table(self.game.__class__.__name__, self.get_width())
+        self.saved_rows = 0
+        self.saved_replay = 0
+        if self.replay is not None:
+            self.replay.clear()
+        self.set_rates(0)
+
+    # set the learning and exploration rates for the given number of episodes played
+    # both decay slightly after every episode, down to a minimum
+    def set_rates(self, episodes: int):
+        self.alpha = max(0.01, 0.1 * 0.999999 ** episodes)
+        self.epsilon = max(0.1, 0.95 * 0.999999 ** episodes)
+
+    # the number of moves in a row of the q-table - one for each column or cell
+    def get_width(self) -> int:
+        return self.game.width if self.game.__class__.__name__ == "Connect4" else 9
+
+    # the key and symmetry of the canonical form of a state string
+    # the game keeps these up to date for its own board, this is for states that come from elsewhere
+    def state_position(self, state: str) -> tuple[int, int]:
+        canonical, symmetry = self.game.canonical_state(state)
+        return state_key(canonical), symmetry
+
+    # map moves into the orientation of the canonical state
+    def canonical_moves(self, moves: list[int], symmetry: int) -> list[int]:
+        return [self.game.canonical_move(move, symmetry) for move in moves]
 
     # choose a move based on the epsilon-greedy policy
-    def choose_move(self, state: str) -> int:
-        remaining_moves = self.game.get_remaining_moves()
+    # the position is given as the key and symmetry of its canonical form
+    # the q-values are looked up for the canonical state, with each move mapped to match
+    # the remaining moves are taken from the game's board unless they are given
+    def choose_move(self, position: tuple[int, int], remaining_moves: list[int] = None) -> int:
+        if remaining_moves is None:
+            remaining_moves = self.game.get_remaining_moves()
         if random.uniform(0, 1) < self.epsilon:
             return random.choice(remaining_moves)
-        q_values = [self.get_q_value(state, move) for move in remaining_moves]
+        key, symmetry = position
+        self.q_table.add_key(key)
+        q_values = self.q_table.key_values(key, self.canonical_moves(remaining_moves, symmetry))
 
         # get the moves with the highest q-value, if more than one, choose randomly from them
         best_moves = [i for i, q in enumerate(q_values) if q == max(q_values)]
@@ -58,17 +121,20 @@ class QLearner:
         return remaining_moves[i]
 
     # update the q-table based on the reward and the q-values of the next state
-    def update_q_table(self, state: str, next_state: str, move: int, reward: float):
-        if state not in self.q_table:
-            self.q_table[state] = {m: default_q for m in self.get_moves_from_state(state)}
-
-        next_moves = self.get_moves_from_state(next_state)
-
-        next_q_values = [self.get_q_value(next_state, next_move) for next_move in next_moves]
+    # symmetric states share an entry - the states are stored in canonical form, with the moves mapped to match
+    # each state is given as the key of its canonical form and its legal moves in that orientation
+    def update_q_table(self, state: tuple[int, list[int]], next_state: tuple[int, list[int]], move: int, reward: float):
+        key, _ = state
+        next_key, next_moves = next_state
+        # add the states with the default q-values if they aren't in the q-table
+        self.q_table.add_key(next_key)
+        next_q_values = self.q_table.key_values(next_key, next_moves)
         best_next_q = max(next_q_values) if next_q_values else default_q
         # reward + discounted best next q-value - current q-value
-        diff = reward + self.gamma * best_next_q - self.q_table[state][move]
-        self.q_table[state][move] += self.alpha * diff
+        self.q_table.add_key(key)
+        q_value = self.q_table.key_values(key, [move])[0]
+        diff = reward + self.gamma * best_next_q - q_value
+        self.q_table.set_key(key, move, q_value + self.alpha * diff)
 
     # check if a move will block a win for the opponent
     # originally used as an intermediary reward for the agent
@@ -76,69 +142,236 @@ class QLearner:
     def blocked_win(self, move: int, token: str) -> bool:
         other_token = self.game.get_other(token)
         self.game.place_token(move, other_token)
-        blocked = self.game.check_win(other_token)
+        blocked = self.game.check_last_win()
         self.game.remove_token(move)
         return blocked
 
+    # play a game between the agent and the opponent, then update the q-table based on the outcome
+    def play_episode(self, params: Parameters):
+        game = self.game
+        agent = 0 if params.goes_first else 1
+        state_history = []
+        move_history = []
+
+        # play a game on the game's kernel
+        # with stats on, the time since the last lap is added to a timer at the end of each part of a move
+        timed = self.stats is not None
+        lap = time.perf_counter() if timed else 0.0
+        done = False
+        reward = 0
+        while not done:
+            # the agent chooses a move based on the epsilon-greedy policy
+            # the moves and states leading up to the final outcome are stored, in the canonical orientation
+            player = game.to_move()
+            if player == agent:
+                key, symmetry = game.canonical_key()
+                remaining_moves = game.get_remaining_moves()
+                if timed:
+                    lap = self.stats.lap(lap, "state encoding")
+                move = self.choose_move((key, symmetry), remaining_moves)
+                if timed:
+                    lap = self.stats.lap(lap, "agent moves")
+                state_history.append((key, self.canonical_moves(remaining_moves, symmetry)))
+                move_history.append(game.canonical_move(move, symmetry))
+            else:
+                # opponent chooses a move randomly half of the time and algorithmically the other half
+                # I found this to be more effective than choosing randomly all the time
+                if random.uniform(0, 1) < 0.5:
+                    move = random.choice(game.get_remaining_moves())
+                else:
+                    # the algorithm has always chosen the opponent's moves as if it were the first player,
+                    # as the game's current token isn't changed during training - kept so training gives the same tables
+                    move = game.algorithm_move(0)
+                if timed:
+                    lap = self.stats.lap(lap, "opponent moves")
+
+            # make the move - the kernel keeps the position's keys up to date
+            _, reward, done = game.step(move)
+            if timed:
+                lap = self.stats.lap(lap, "placing tokens")
+
+        # game is over - determine reward for final outcome
+        # the reward is for the player who made the last move
+        agent_won = player == agent if reward else None
+        self.learn_episode(state_history, move_history, self.final_reward(params, agent_won, len(game.move_history)))
+        if timed:
+            self.stats.lap(lap, "updates")
+
+        # reset the game
+        game.reset()
+
+    # the reward for the outcome of a game - agent_won is None for a draw
+    # wins are worth more the quicker they are, losses cost less the longer they are put off
+    @staticmethod
+    def final_reward(params: Parameters, agent_won: bool | None, move_number: int) -> float:
+        if agent_won is None:
+            return params.draw_reward
+        if agent_won:
+            return params.win_reward - move_number
+        return params.loss_reward + move_number
+
+    # the q-table is updated for each state and move leading up to the final outcome
+    # the reward is discounted slightly for earlier moves
+    # the states are (canonical key, legal moves) and the moves are in the canonical orientation
+    # with a replay buffer, the moves are added to it instead, and the q-table is only updated by replaying a batch of
+    # past moves after each episode
+    def learn_episode(self, state_history: list[tuple[int, list[int]]], move_history: list[int], final_reward: float):
+        for state, move in zip(reversed(state_history), reversed(move_history)):
+            if self.replay is None:
+                self.update_q_table(state, state, move, final_reward)
+            else:
+                self.replay.add(state[0], state[1], move, final_reward)
+            final_reward *= self.gamma
+        if self.replay is not None and len(self.replay) >= self.replay.batch_size:
+            self.replay_batch()
+
+    # apply the same update as update_q_table to a batch of moves sampled from the replay buffer, all at once
+    # the q-values are updated in place through a numpy view of the table's values, after every row is added
+    # as the table can't grow while the view is held
+    # moves sampled more than once in a batch have each of their updates added
+    def replay_batch(self):
+        buffer = self.replay
+        indices, weights = buffer.sample()
+        keys = buffer.keys[indices]
+        offsets = np.array([self.q_table.add_key(key) for key in keys])
+        self.q_table.changed.update(keys)
+        values = np.frombuffer(self.q_table.values, dtype=np.float32)
+        # the best q-value of the legal moves in each state, as in update_q_table the next state is the state itself
+        moves = np.arange(self.q_table.width)
+        rows = values[offsets[:, None] + moves]
+        legal = (buffer.legal[indices, None] >> moves & 1).astype(bool)
+        best_next_q = np.where(legal, rows, -np.inf).max(axis=1)
+        cells = offsets + buffer.moves[indices] - 1
+        errors = buffer.rewards[indices] + self.gamma * best_next_q - values[cells]
+        np.add.at(values, cells, (self.alpha * weights * errors).astype(np.float32))
+        del values
+        buffer.set_priorities(indices, errors)
+        if self.stats is not None:
+            self.stats.count("replayed moves", len(indices))
+
+    # play a batch of episodes on the vectorised environment, with a game in progress on every board at once
+    # the opponent's moves are chosen for all the boards together, the agent's are still looked up one board at a time
+    # the learning and exploration rates are set from the number of episodes finished so far
+    # games still in progress once the batch is complete are thrown away
+    def train_batch_vectorised(self, params: Parameters, first_episode: int):
+        env = self.env
+        env.reset()
+        agent = 1 if params.goes_first else 2
+        histories = [([], []) for _ in range(env.n)]
+        # the boards whose current game is part of the batch
+        started = min(env.n, self.batch_size)
+        counted = env.all < started
+        episode = first_episode
+        # with stats on, the time since the last lap is added to a timer at the end of each part of a step
+        timed = self.stats is not None
+        lap = time.perf_counter() if timed else 0.0
+        with tqdm(total=self.batch_size) as progress:
+            while episode < first_episode + self.batch_size:
+                actions = np.empty(env.n, dtype=np.int64)
+                agent_turn = np.flatnonzero(env.player == agent)
+                # opponent chooses a move randomly half of the time and algorithmically the other half
+                opponent_turn = np.flatnonzero(env.player != agent)
+                random_move = env.rng.random(len(opponent_turn)) < 0.5
+                actions[opponent_turn[random_move]] = env.random_actions(opponent_turn[random_move])
+                # the algorithm plays as the first player whichever side it's on, the same as in play_episode
+                actions[opponent_turn[~random_move]] = env.algo_actions(opponent_turn[~random_move], as_player=1)
+                self.set_rates(episode)
+                if timed:
+                    lap = self.stats.lap(lap, "opponent moves")
+                for i in agent_turn:
+                    key, symmetry = self.state_position(env.state(i))
+                    legal_moves = env.legal_moves(i)
+                    if timed:
+                        lap = self.stats.lap(lap, "state encoding")
+                    move = self.choose_move((key, symmetry), legal_moves)
+                    histories[i][0].append((key, self.canonical_moves(legal_moves, symmetry)))
+                    histories[i][1].append(self.game.canonical_move(move, symmetry))
+                    actions[i] = move - 1
+                    if timed:
+                        lap = self.stats.lap(lap, "agent moves")
+
+                winners, done, lengths = env.step(actions)
+                if timed:
+                    lap = self.stats.lap(lap, "placing tokens")
+                for i in np.flatnonzero(done):
+                    if counted[i]:
+                        agent_won = winners[i] == agent if winners[i] else None
+                        self.learn_episode(*histories[i], self.final_reward(params, agent_won, lengths[i]))
+                        if timed:
+                            lap = self.stats.lap(lap, "updates")
+                        episode += 1
+                        progress.update()
+                        counted[i] = started < self.batch_size
+                        started += counted[i]
+                    histories[i] = ([], [])
+
+    # play a batch of episodes split between worker processes
+    # each worker starts from the q-table as it is at the start of the batch
+    # at the end of the batch, the change each worker made to a row is averaged and applied to the learner's q-table
+    def train_batch_parallel(self, params: Parameters, first_episode: int):
+        sizes = [self.batch_size // self.workers + (w < self.batch_size % self.workers) for w in range(self.workers)]
+        starts = [first_episode + sum(sizes[:w]) for w in range(self.workers)]
+        with Pool(self.workers, initializer=init_training_worker, initargs=(self,)) as pool:
+            results = pool.map(play_worker_episodes, [(params, start, size) for start, size in zip(starts, sizes)])
+
+        # the moves each worker added are added to the learner's replay buffer, worker by worker
+        # so later batches replay them too - the priorities the workers changed for older moves aren't kept
+        changes = {}
+        for rows, entries in results:
+            for key, row in rows.items():
+                changes.setdefault(key, []).append(row)
+            if entries is not None:
+                self.replay.extend(entries)
+        values = self.q_table.values
+        for key, rows in changes.items():
+            offset = self.q_table.add_key(key)
+            for m in range(self.q_table.width):
+                old = values[offset + m]
+                values[offset + m] = old + sum(row[m] - old for row in rows) / len(rows)
+            self.q_table.changed.add(key)
+
     # main training logic
     # plays games and updates the q-table based on the outcomes
     def train_once(self, params: Parameters):
         # agent that goes first is trained separately to the agent that goes second
         print("Training agent that goes first" if params.goes_first else "Training agent that goes second")
-        tokens = self.game.get_tokens()
-        agent, opponent = (tokens[0], tokens[1]) if params.goes_first else (tokens[1], tokens[0])
+        agent = self.game.get_tokens()[0 if params.goes_first else 1]
+        file_name = self.get_file_name(params.goes_first)
+        checkpoint_name = f"{file_name}.ckpt"
+
+        # carry on from the batch after the last checkpoint, or start again without one
+        start = 1
+        if self.resume:
+            checkpoint = self.load_checkpoint(checkpoint_name)
+            if checkpoint is not None and checkpoint["done"]:
+                print("Training already finished")
+                return
+            if checkpoint is not None:
+                start = checkpoint["batch"] + 1
+                print(f"Resuming from batch {start} with {len(self.q_table)} states")
+        elif os.path.exists(checkpoint_name):
+            os.remove(checkpoint_name)
 
         # play games in batches
         # after each batch, test the agent against an opponent
         # if the agent loses more than the loss threshold and ties more than the draw threshold, continue training
-        for i in range(1, self.batches+1):
-            for e in trange(self.batch_size):
-                token = tokens[0]
-                state_history = []
-                move_history = []
-
-                # play a game
-                state = self.game.get_state()
-                move_number = 0
-                while not self.game.game_over():
-                    # the agent chooses a move based on the epsilon-greedy policy
-                    # the moves and states leading up to the final outcome are stored
-                    if token == agent:
-                        move = self.choose_move(state)
-                        state_history.append(state)
-                        move_history.append(move)
-                    else:
-                        # opponent chooses a move randomly half of the time and algorithmically the other half
-                        # I found this to be more effective than choosing randomly all the time
-                        if random.uniform(0, 1) < 0.5:
-                            move = random.choice(self.game.get_remaining_moves())
-                        else:
-                            move = self.game.algorithm_choose_move()
-
-                    # place the token and update the state
-                    self.game.place_token(move, token)
-                    state = self.game.get_state()
-                    token = self.game.get_other(token)
-                    move_number += 1
-
-                # game is over - determine reward for final outcome
-                if self.game.check_win(agent):
-                    final_reward = params.win_reward - move_number
-                elif self.game.check_win(opponent):
-                    final_reward = params.loss_reward + move_number
-                else:
-                    final_reward = params.draw_reward
-
-                # the q-table is updated for each state and move leading up to the final outcome
-                # the reward is discounted slightly for earlier moves
-                for state, move in zip(reversed(state_history), reversed(move_history)):
-                    self.update_q_table(state, state, move, final_reward)
-                    final_reward *= self.gamma
-
-                # reset the game and decrease the learning and exploration rates
-                self.game.reset()
-                self.alpha = max(0.01, self.alpha * 0.999999)
-                self.epsilon = max(0.1, self.epsilon * 0.999999)
+        i = start - 1
+        for i in range(start, self.batches+1):
+            first_episode = (i - 1) * self.batch_size
+            batch_start = time.perf_counter()
+            if self.workers > 1:
+                self.train_batch_parallel(params, first_episode)
+            elif self.env is not None:
+                self.train_batch_vectorised(params, first_episode)
+            else:
+                for e in trange(first_episode, first_episode + self.batch_size):
+                    # decrease the learning and exploration rates as training goes on
+                    self.set_rates(e)
+                    self.play_episode(params)
+            self.set_rates(first_episode + self.batch_size)
+            if self.stats is not None:
+                self.stats.count("episodes", self.batch_size)
+                self.stats.record_batch(self.batch_size, time.perf_counter() - batch_start, len(self.q_table), self.q_table.memory())
 
             # after each batch, test the agent against an opponent
             self.game.q_tables[agent] = self.q_table
@@ -147,19 +380,115 @@ class QLearner:
             stats = [0, 0, 0]
             testing_games = 1000
             # play 1000 games and see if the agent reaches the thresholds
-            for j in range(testing_games):
-                winner = self.game.play(not params.goes_first)
-                self.game.reset()
-                stats[winner] += 1
+            test_start = time.perf_counter()
+            if self.env is not None:
+                stats = self.env.play(("qlearn", "algo"), testing_games, not params.goes_first)
+            elif self.workers > 1:
+                seed = f"{self.seed}-{params.goes_first}-{total_episodes}"
+                stats = evaluate(self.game, testing_games, self.workers, not params.goes_first, seed, progress=False)
+            else:
+                for j in range(testing_games):
+                    winner = self.game.play(not params.goes_first)
+                    self.game.reset()
+                    stats[winner] += 1
             print(f"Wins: {stats[0]} | Losses: {stats[1]} | Draws: {stats[2]}")
+            if self.stats is not None:
+                self.stats.timers["testing"] += time.perf_counter() - test_start
 
             # if the agent reaches the draw/loss thresholds, stop training
             if stats[1] <= testing_games * params.loss_threshold and stats[2] <= testing_games * params.draw_threshold:
                 break
+            if self.checkpoint_every and i % self.checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_name, i)
 
         # save the q_table after training
-        file_name = self.get_file_name(params.goes_first)
+        # the last checkpoint marks the training as finished, only once the table is saved
         self.save_q_table(file_name, True)
+        self.save_checkpoint(checkpoint_name, i, done=True)
+
+    # append a checkpoint to the checkpoint file
+    # it holds the learner's state after the batch, and the rows of the q-table changed since the last checkpoint
+    # the first checkpoint has every row, so replaying them all in order rebuilds the table
+    # only writing the changes saves pickling the whole table every time
+    # rows added since the last checkpoint are written even if no value in them was set, and the rows are written in
+    # the order they were added, so replaying the checkpoints gives each row the same id and the same table
+    def save_checkpoint(self, file_name: str, batch: int, done=False):
+        keys = self.q_table.changed
+        if self.q_table.rows is not None:
+            keys = sorted(keys.union(islice(self.q_table.rows, self.saved_rows, None)), key=self.q_table.rows.__getitem__)
+            self.saved_rows = len(self.q_table)
+        checkpoint = {
+            "batch": batch,
+            "done": done,
+            "seed": self.seed,
+            "alpha": self.alpha,
+            "epsilon": self.epsilon,
+            "random": random.getstate(),
+            "env_random": self.env.rng.bit_generator.state if self.env is not None else None,
+            "rows": {key: self.q_table.key_row(key) for key in keys},
+            "replay": self.replay_checkpoint(),
+        }
+        with open(file_name, "ab") as file:
+            pickle.dump(checkpoint, file)
+            file.flush()
+            os.fsync(file.fileno())
+        self.q_table.changed = set()
+
+    # rebuild the q-table and the learner's state from a checkpoint file
+    # returns the last checkpoint, or None if there are none
+    # a checkpoint cut off by a crash is ignored and removed from the file, so later checkpoints follow on from the last complete one
+    def load_checkpoint(self, file_name: str) -> dict | None:
+        if not os.path.exists(file_name):
+            return None
+        checkpoint = None
+        end = 0
+        with open(file_name, "r+b") as file:
+            while True:
+                try:
+                    record = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break
+                for key, row in record["rows"].items():
+                    offset = self.q_table.add_key(key)
+                    self.q_table.values[offset:offset + self.q_table.width] = row
+                if self.replay is not None and record.get("replay") is not None:
+                    self.replay.extend(record["replay"]["entries"])
+                checkpoint = record
+                end = file.tell()
+            file.truncate(end)
+        self.saved_rows = len(self.q_table)
+        if self.replay is not None:
+            self.saved_replay = self.replay.added
+        if checkpoint is None:
+            return None
+
+        self.seed = checkpoint["seed"]
+        self.alpha = checkpoint["alpha"]
+        self.epsilon = checkpoint["epsilon"]
+        random.setstate(checkpoint["random"])
+        if self.env is not None and checkpoint["env_random"] is not None:
+            self.env.rng.bit_generator.state = checkpoint["env_random"]
+        if self.replay is not None and checkpoint.get("replay") is not None:
+            state = checkpoint["replay"]
+            self.replay.rng.bit_generator.state = state["random"]
+            self.replay.max_priority = state["max_priority"]
+            if state["priorities"] is not None:
+                self.replay.priorities[:] = state["priorities"]
+        return checkpoint
+
+    # the replay buffer's part of a checkpoint - the moves added since the last checkpoint and its random state
+    # replaying changes the priorities of older moves too, so when prioritised all of them are saved
+    def replay_checkpoint(self) -> dict | None:
+        if self.replay is None:
+            return None
+        state = {
+            "entries": self.replay.entries_since(self.saved_replay),
+            "random": self.replay.rng.bit_generator.state,
+            "max_priority": self.replay.max_priority,
+            "priorities": self.replay.priorities.copy() if self.replay.prioritised else None,
+        }
+        self.saved_replay = self.replay.added
+        return state
 
     # train the agent based on the parameters
     # allows to train both agents one after the other, or just one
@@ -182,4 +511,4 @@ class QLearner:
         file_name = f"{file_name}.pkl" if pickled else f"{file_name}.json"
         mode = 'wb' if pickled else 'w'
         with open(file_name, mode) as file:
-            pickle.dump(self.q_table, file) if pickled else json.dump(self.q_table, file)
\ No newline at end of file
+            pickle.dump(self.q_table, file) if pickled else json.dump(self.q_table.to_dict(), file)
\ No newline at end of file
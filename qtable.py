@@ -0,0 +1,232 @@
+import mmap
+import struct
+import sys
+from array import array
+
+# default q value for states
+default_q = 0.0
+
+# header of a mapped q-table file - magic, bytes per state key, values per row, number of states
+mapped_header = struct.Struct("<4sIIQ")
+mapped_magic = b"QTB1"
+
+# the digit each token is given when a state is read as a number in base 3
+codes = str.maketrans({" ": "0", "X": "1", "O": "2", "R": "1", "B": "2"})
+
+
+# convert a state string to an integer by reading it as a number in base 3
+# much smaller to store than the string itself
+def state_key(state: str) -> int:
+    return int(state.translate(codes), 3)
+
+
+# compact q-table
+# each state is given an integer row id, and the q-values are kept in one contiguous float32 array
+# with a row of `width` values per state - one for each move, so move m is at index m - 1 in the row
+class QTable:
+    def __init__(self, width: int):
+        self.width = width
+        self.rows = {}  # state key: row id
+        self.values = array("f")
+        self.blank_row = array("f", [default_q] * width)
+        # keys of the states whose values have been set
+        self.changed = set()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, state: str) -> bool:
+        return state_key(state) in self.rows
+
+    # get the index of the first value of a state's row, or None if it isn't in the table
+    def offset(self, state: str) -> int | None:
+        return self.key_offset(state_key(state))
+
+    def key_offset(self, key: int) -> int | None:
+        row = self.rows.get(key)
+        return None if row is None else row * self.width
+
+    # get the values of the row with the given state key
+    def key_row(self, key: int) -> array:
+        offset = self.key_offset(key)
+        return self.values[offset:offset + self.width]
+
+    # add a row for a state if it isn't in the table, returning the index of its first value
+    def add(self, state: str) -> int:
+        return self.add_key(state_key(state))
+
+    def add_key(self, key: int) -> int:
+        row = self.rows.get(key)
+        if row is None:
+            row = self.rows[key] = len(self.rows)
+            self.values.extend(self.blank_row)
+        return row * self.width
+
+    # get the q-value of a move, the default if the state isn't in the table
+    def get(self, state: str, move: int) -> float:
+        offset = self.offset(state)
+        return default_q if offset is None else self.values[offset + move - 1]
+
+    # get the q-values of several moves in the same state
+    def get_values(self, state: str, moves: list[int]) -> list[float]:
+        return self.key_values(state_key(state), moves)
+
+    def key_values(self, key: int, moves: list[int]) -> list[float]:
+        offset = self.key_offset(key)
+        if offset is None:
+            return [default_q] * len(moves)
+        return [self.values[offset + move - 1] for move in moves]
+
+    # set the q-value of a move, adding the state if it isn't in the table
+    def set(self, state: str, move: int, value: float):
+        self.set_key(state_key(state), move, value)
+
+    def set_key(self, key: int, move: int, value: float):
+        self.values[self.add_key(key) + move - 1] = value
+        self.changed.add(key)
+
+    # the keys of every state in the table
+    def keys(self):
+        return self.rows.keys()
+
+    # roughly how many bytes the table takes up in memory - the values, and the dictionary of row ids and its keys
+    def memory(self) -> int:
+        return len(self.values) * self.values.itemsize + sys.getsizeof(self.rows) + sum(map(sys.getsizeof, self.rows))
+
+    # the table as a dictionary of state key: (move: q-value), used for saving as json
+    def to_dict(self) -> dict:
+        return {key: {m: self.values[row * self.width + m - 1] for m in range(1, self.width + 1)} for key, row in self.rows.items()}
+
+
+# q-table with a row for every possible state, for games small enough to allow it
+# the row is the state read as a number in base 3, so no dictionary of row ids is needed
+# TicTacToe has 3^9 = 19683 states, so the whole table takes under 1MB
+class DenseQTable(QTable):
+    def __init__(self, cells: int, width: int):
+        super().__init__(width)
+        self.rows = None
+        self.visited = bytearray(3 ** cells)
+        self.values = array("f", [default_q]) * (width * 3 ** cells)
+
+    def __len__(self) -> int:
+        return sum(self.visited)
+
+    def __contains__(self, state: str) -> bool:
+        return self.visited[state_key(state)] == 1
+
+    def key_offset(self, key: int) -> int | None:
+        return key * self.width if self.visited[key] else None
+
+    def add_key(self, key: int) -> int:
+        self.visited[key] = 1
+        return key * self.width
+
+    def keys(self):
+        return (key for key, visited in enumerate(self.visited) if visited)
+
+    def memory(self) -> int:
+        return len(self.values) * self.values.itemsize + len(self.visited)
+
+    def to_dict(self) -> dict:
+        return {key: {m: self.values[key * self.width + m - 1] for m in range(1, self.width + 1)}
+                for key, visited in enumerate(self.visited) if visited}
+
+
+# read-only q-table memory-mapped from a file written by save_mapped
+# the file holds the sorted state keys, each a fixed number of big-endian bytes, followed by a float32 row for each state
+# the values are read straight from the map, so they are stored in the machine's byte order
+# a lookup binary searches the keys, so only the pages it touches are read from disk,
+# and processes using the same file share those pages through the page cache rather than each holding a copy
+class MappedQTable(QTable):
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        with open(file_name, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.key_bytes, width, self.count = mapped_header.unpack_from(self.map)
+        if magic != mapped_magic:
+            raise ValueError(f"{file_name} is not a mapped q-table")
+        super().__init__(width)
+        self.rows = None
+        self.keys_start = mapped_header.size
+        values_start = aligned(self.keys_start + self.count * self.key_bytes)
+        self.values = memoryview(self.map)[values_start:values_start + self.count * width * 4].cast("f")
+
+    # reopen the file rather than copying the table when sent to another process
+    def __reduce__(self):
+        return MappedQTable, (self.file_name,)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, state: str) -> bool:
+        return self.key_offset(state_key(state)) is not None
+
+    def key_offset(self, key: int) -> int | None:
+        if key.bit_length() > self.key_bytes * 8:
+            return None
+        target = key.to_bytes(self.key_bytes, "big")
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            start = self.keys_start + mid * self.key_bytes
+            if self.map[start:start + self.key_bytes] < target:
+                low = mid + 1
+            else:
+                high = mid
+        start = self.keys_start + low * self.key_bytes
+        if low < self.count and self.map[start:start + self.key_bytes] == target:
+            return low * self.width
+        return None
+
+    def add_key(self, key: int) -> int:
+        raise TypeError("mapped q-tables are read-only")
+
+    # the file is mapped rather than read, so only the pages that have been looked up take up memory
+    # this is the most it can take
+    def memory(self) -> int:
+        return len(self.map)
+
+    def keys(self):
+        return (int.from_bytes(self.map[start:start + self.key_bytes], "big")
+                for start in range(self.keys_start, self.keys_start + self.count * self.key_bytes, self.key_bytes))
+
+    def to_dict(self) -> dict:
+        return {key: {m: self.values[row * self.width + m - 1] for m in range(1, self.width + 1)} for row, key in enumerate(self.keys())}
+
+
+# round an offset in a file up to a multiple of 8
+def aligned(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# write a q-table in the format read by MappedQTable
+# the keys are given the fewest bytes that hold the largest key, so sorting the bytes sorts the keys
+def save_mapped(q_table: QTable, file_name: str):
+    keys = sorted(q_table.keys())
+    key_bytes = max(1, (keys[-1].bit_length() + 7) // 8) if keys else 1
+    values = array("f")
+    for key in keys:
+        values.extend(q_table.key_row(key))
+    with open(file_name, "wb") as file:
+        file.write(mapped_header.pack(mapped_magic, key_bytes, q_table.width, len(keys)))
+        file.write(b"".join(key.to_bytes(key_bytes, "big") for key in keys))
+        file.write(bytes(aligned(file.tell()) - file.tell()))
+        values.tofile(file)
+
+
+# create an empty q-table for a game
+def new_q_table(game: str, width: int) -> QTable:
+    return DenseQTable(9, 9) if game == "TicTacToe" else QTable(width)
+
+
+# convert a q-table stored as a dictionary of state: (move: q-value) into a compact q-table
+# states can be given as strings, or as the integer keys the compact tables use
+def from_dict(table: dict, game: str) -> QTable:
+    width = max((int(move) for moves in table.values() for move in moves), default=9)
+    q_table = new_q_table(game, width)
+    for state, moves in table.items():
+        key = int(state) if isinstance(state, int) or state.isdigit() else state_key(state)
+        offset = q_table.add_key(key)
+        for move, value in moves.items():
+            q_table.values[offset + int(move) - 1] = value
+    return q_table
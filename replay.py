@@ -0,0 +1,92 @@
+import numpy as np
+
+
+# experience replay for the q-learner
+# the agent's moves are kept in preallocated ring-buffer arrays, and once it is full the oldest are overwritten
+# each entry is the key of a canonical state, its legal moves as a bitmask, the move made and the reward it was given
+# batches are sampled uniformly, or when prioritised in proportion to the size of each entry's last td error,
+# so the moves the q-table is most wrong about are replayed most
+class ReplayBuffer:
+    # how strongly the td errors shape the sampling - 0 is uniform
+    priority_exponent = 0.6
+    # how much the bias of prioritised sampling is corrected by scaling down the updates of often sampled entries
+    importance_exponent = 0.4
+    # added to each priority so entries with no error are still sampled now and then
+    min_priority = 1e-3
+    # the arrays each entry is spread across
+    fields = ("keys", "legal", "moves", "rewards", "priorities")
+
+    def __init__(self, capacity: int, batch_size: int, prioritised=False, seed=None):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.prioritised = prioritised
+        self.rng = np.random.default_rng(seed)
+        # the keys of large boards don't fit in 64 bits, so they are kept as python integers
+        self.keys = np.zeros(capacity, dtype=object)
+        self.legal = np.zeros(capacity, dtype=np.int64)
+        self.moves = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.priorities = np.zeros(capacity, dtype=np.float64)
+        self.clear()
+
+    def __len__(self) -> int:
+        return self.size
+
+    # empty the buffer, without freeing its arrays
+    def clear(self):
+        self.size = 0
+        self.next = 0
+        # the number of entries ever added, so the entries added since a point in training can be found
+        self.added = 0
+        # new entries are given the highest priority so far, so each is replayed at least once soon after it is added
+        self.max_priority = 1.0
+
+    # add a move to the buffer, overwriting the oldest once it is full
+    # the legal moves and the move are in the canonical orientation
+    def add(self, key: int, moves: list[int], move: int, reward: float):
+        i = self.next
+        self.keys[i] = key
+        self.legal[i] = sum(1 << (m - 1) for m in moves)
+        self.moves[i] = move
+        self.rewards[i] = reward
+        self.priorities[i] = self.max_priority
+        self.next = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.added += 1
+
+    # the entries added since the given number had been added, in the order they were added, as an array for each field
+    # only the entries still in the buffer are returned, and the count is how many were added in all
+    def entries_since(self, added: int) -> dict:
+        kept = min(self.added - added, self.capacity)
+        indices = (self.next - kept + np.arange(kept)) % self.capacity
+        return dict({name: getattr(self, name)[indices] for name in self.fields}, count=self.added - added)
+
+    # add entries from entries_since to the buffer, as if each had been added in turn
+    # so they end up in the same places as in the buffer they came from, if it was in step with this one
+    def extend(self, entries: dict):
+        count = entries["count"]
+        kept = len(entries["keys"])
+        indices = (self.next + count - kept + np.arange(kept)) % self.capacity
+        for name in self.fields:
+            getattr(self, name)[indices] = entries[name]
+        if kept:
+            self.max_priority = max(self.max_priority, entries["priorities"].max())
+        self.next = (self.next + count) % self.capacity
+        self.size = min(self.size + count, self.capacity)
+        self.added += count
+
+    # sample a batch of entries, returning their indices and the weight to scale each one's update by
+    def sample(self) -> tuple[np.ndarray, np.ndarray]:
+        if not self.prioritised:
+            return self.rng.integers(0, self.size, self.batch_size), np.ones(self.batch_size)
+        probabilities = self.priorities[:self.size] ** self.priority_exponent
+        probabilities /= probabilities.sum()
+        indices = self.rng.choice(self.size, self.batch_size, p=probabilities)
+        weights = (self.size * probabilities[indices]) ** -self.importance_exponent
+        return indices, weights / weights.max()
+
+    # set the priorities of sampled entries from the td errors of their updates
+    def set_priorities(self, indices: np.ndarray, errors: np.ndarray):
+        priorities = np.abs(errors) + self.min_priority
+        self.priorities[indices] = priorities
+        self.max_priority = max(self.max_priority, priorities.max())
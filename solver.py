@@ -0,0 +1,119 @@
+import struct
+
+from tqdm import tqdm
+
+from qtable import state_key
+
+# header of a solution file - magic, number of cells on the board, number of positions
+solution_header = struct.Struct("<4sBI")
+solution_magic = b"SOLV"
+# the largest board solve will be run on - 5x4 Connect4 already takes a few minutes
+max_solve_cells = 20
+
+
+# the game-theoretic value and best move of every position reachable in a game, found by retrograde analysis
+# values are from the point of view of the player to move: positive is a win, negative a loss and 0 a draw
+# the size of a value is the number of moves left in the game when the winning move is made, so quicker wins score higher
+# positions are stored in canonical form, with the move in the canonical orientation
+# the file holds the sorted state keys as fixed-width big-endian bytes, each followed by a signed byte for the value
+# and a byte for the move - lookups binary search the bytes, so nothing has to be unpacked when it is loaded
+class Solution:
+    def __init__(self, cells: int, data: bytes):
+        self.cells = cells
+        self.data = data
+        self.key_bytes = ((3 ** cells - 1).bit_length() + 7) // 8
+        self.entry_size = self.key_bytes + 2
+        self.count = (len(data) - solution_header.size) // self.entry_size
+
+    def __len__(self) -> int:
+        return self.count
+
+    # get the value and best move of a canonical state, or None if it isn't reachable or the game is over
+    def lookup(self, canonical: str) -> tuple[int, int] | None:
+        target = state_key(canonical).to_bytes(self.key_bytes, "big")
+        low, high = 0, self.count
+        while low < high:
+            mid = (low + high) // 2
+            start = solution_header.size + mid * self.entry_size
+            if self.data[start:start + self.key_bytes] < target:
+                low = mid + 1
+            else:
+                high = mid
+        start = solution_header.size + low * self.entry_size
+        if low == self.count or self.data[start:start + self.key_bytes] != target:
+            return None
+        value = int.from_bytes(self.data[start + self.key_bytes:start + self.key_bytes + 1], "big", signed=True)
+        return value, self.data[start + self.key_bytes + 1]
+
+    # the value and best move for the game's current position, with the move mapped back to the board's orientation
+    def best_move(self, game) -> tuple[int, int] | None:
+        canonical, symmetry = game.canonical_state(game.get_state())
+        entry = self.lookup(canonical)
+        if entry is None:
+            return None
+        return entry[0], game.board_move(entry[1], symmetry)
+
+    @classmethod
+    def load(cls, file_name: str):
+        with open(file_name, "rb") as file:
+            data = file.read()
+        magic, cells, _ = solution_header.unpack_from(data)
+        if magic != solution_magic:
+            raise ValueError(f"{file_name} is not a solution")
+        return cls(cells, data)
+
+
+# solve every position reachable from the empty board, returning canonical state key: (value, best move)
+# first the reachable positions that aren't over are found one ply at a time,
+# then they are valued from the last ply back to the first - a move that wins or fills the board has a known value,
+# otherwise the move is worth minus the value of the position it leads to, which has already been found
+# ties between moves go to the first move in the game's move order
+def solve(game, progress=True) -> dict[int, tuple[int, int]]:
+    game.reset()
+    empty, _ = game.canonical_state(game.get_state())
+    levels = [{state_key(empty): empty}]
+    for _ in tqdm(range(game.max_moves - 1), desc="Finding positions", disable=not progress):
+        next_level = {}
+        for state in levels[-1].values():
+            game.set_state(state)
+            token = game.current_token
+            for move in game.get_remaining_moves():
+                game.place_token(move, token)
+                if not game.check_last_win():
+                    canonical, _ = game.canonical_state(game.get_state())
+                    next_level[state_key(canonical)] = canonical
+                game.remove_token(move)
+        levels.append(next_level)
+
+    solution = {}
+    for ply in tqdm(reversed(range(len(levels))), total=len(levels), desc="Solving", disable=not progress):
+        for key, state in levels[ply].items():
+            game.set_state(state)
+            token = game.current_token
+            best_value, best_move = None, None
+            for move in game.get_remaining_moves():
+                game.place_token(move, token)
+                if game.check_last_win():
+                    value = game.max_moves - ply
+                elif ply + 1 == game.max_moves:
+                    value = 0
+                else:
+                    canonical, _ = game.canonical_state(game.get_state())
+                    value = -solution[state_key(canonical)][0]
+                game.remove_token(move)
+                if best_value is None or value > best_value:
+                    best_value, best_move = value, move
+            solution[key] = (best_value, best_move)
+        # the positions of this ply are only needed to find those of the ply before
+        levels[ply] = None
+    game.reset()
+    return solution
+
+
+# write a solution in the format read by Solution
+def save_solution(solution: dict[int, tuple[int, int]], cells: int, file_name: str):
+    key_bytes = ((3 ** cells - 1).bit_length() + 7) // 8
+    with open(file_name, "wb") as file:
+        file.write(solution_header.pack(solution_magic, cells, len(solution)))
+        file.write(b"".join(key.to_bytes(key_bytes, "big") + value.to_bytes(1, "big", signed=True) + bytes([move])
+                            for key, (value, move) in sorted(solution.items())))
@@ -0,0 +1,79 @@
+import json
+import time
+from collections import defaultdict
+
+
+# opt-in counters and timers for searching and training
+# the game and learner only record into a Stats object if they have been given one, so it costs nothing when turned off
+class Stats:
+    def __init__(self):
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        # the number of alpha-beta cutoffs at each ply below the root
+        self.cutoffs = defaultdict(int)
+        # player type: [(seconds, nodes, depth)] for each move chosen
+        self.moves = defaultdict(list)
+        # the stats of each training batch
+        self.batches = []
+
+    def count(self, name: str, amount=1):
+        self.counters[name] += amount
+
+    def cutoff(self, ply: int):
+        self.cutoffs[ply] += 1
+
+    # add the time since the last lap to the named timer, returning the time of this lap
+    # used in the training loops, which check once whether stats are on rather than entering a timer for every move
+    def lap(self, last: float, name: str) -> float:
+        now = time.perf_counter()
+        self.timers[name] += now - last
+        return now
+
+    def record_move(self, player_type: str, seconds: float, nodes: int, depth: int):
+        self.moves[player_type].append((seconds, nodes, depth))
+
+    def record_batch(self, episodes: int, seconds: float, states: int, memory: int):
+        self.batches.append({"episodes": episodes, "seconds": seconds, "episodes_per_sec": episodes / seconds if seconds else None,
+                             "states": states, "memory_bytes": memory})
+
+    # summarise the moves of each player type
+    # the effective branching factor is the number of nodes searched for a move to the power of 1 / the depth searched,
+    # i.e. the number of moves a full tree of that depth would have to search at each node to be the same size
+    def move_summary(self) -> dict:
+        summary = {}
+        for player_type, moves in self.moves.items():
+            seconds = [s for s, _, _ in moves]
+            nodes = sum(n for _, n, _ in moves)
+            factors = [n ** (1 / d) for _, n, d in moves if n and d]
+            summary[player_type] = {
+                "moves": len(moves),
+                "seconds": sum(seconds),
+                "mean_seconds_per_move": sum(seconds) / len(moves),
+                "max_seconds_per_move": max(seconds),
+                "nodes": nodes,
+                "nodes_per_sec": nodes / sum(seconds) if sum(seconds) else None,
+                "mean_branching_factor": sum(factors) / len(factors) if factors else None,
+            }
+        return summary
+
+    def to_dict(self) -> dict:
+        return {
+            "counters": dict(self.counters),
+            "timers": dict(self.timers),
+            "cutoffs_by_ply": {ply: self.cutoffs[ply] for ply in sorted(self.cutoffs)},
+            "moves": self.move_summary(),
+            "batches": self.batches,
+        }
+
+    # print the stats, either as json or as readable text
+    def report(self, output_format="text"):
+        stats = self.to_dict()
+        if output_format == "json":
+            print(json.dumps(stats, indent=2))
+            return
+        for section, values in stats.items():
+            if not values:
+                continue
+            print(f"{section}:")
+            for name, value in (values.items() if isinstance(values, dict) else enumerate(values, 1)):
+                print(f"  {name}: {value}")
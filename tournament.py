@@ -0,0 +1,210 @@
+import csv
+import json
+import math
+import os
+import random
+from multiprocessing import Pool
+
+from tqdm import tqdm
+
+from linear import load_linear_models
+from transposition import TranspositionTable
+from util import Player, load_q_tables, param_or_default, parse_duration
+
+# the game class, entrants and pairings each tournament worker process plays
+# with the fork start method the q-tables and models the entrants loaded are shared copy-on-write rather than copied
+worker_tournament = None
+
+# the config keys that set one of the game's attributes for an entrant's moves, and the attribute each sets
+setting_keys = {"depth": "max_depth", "playouts": "playouts", "time": "time_budget"}
+# the number of drawn games each pairing is assumed to start with when fitting the ratings
+# keeps the ratings finite when a player wins or loses every game, and pulls ratings from few games towards the rest
+prior_draws = 1
+
+
+# the board size as it is written in file names, e.g. 7x6, or blank for TicTacToe
+def board_name(board) -> str:
+    return f"{board[0]}x{board[1]}" if board is not None else ""
+
+
+# set up a tournament worker process
+def init_tournament_worker(tournament):
+    global worker_tournament
+    worker_tournament = tournament
+
+
+# an entrant in the tournament, loaded from its config
+# the config is a dictionary with the player type and optionally its name, search depth, number of playouts,
+# time per move, the name its q-tables or linear models were saved under, and its board size (Connect4 only)
+class Entrant:
+    def __init__(self, cls, config: dict, default_board):
+        self.config = {key: value for key, value in config.items() if key != "name"}
+        self.type = config["type"]
+        self.board = tuple(config.get("board", default_board)) if cls.__name__ == "Connect4" else None
+        # unnamed entrants are named after their config, e.g. minimax_ab-depth4 or qlearn-board5x4
+        self.name = config.get("name", "-".join([self.type] + [f"{key}{'x'.join(map(str, value)) if isinstance(value, list) else value}"
+                                                               for key, value in self.config.items() if key != "type"]))
+
+        # a game on the entrant's board to load its tables and models for
+        game = cls(Player(self.type), Player(self.type), False, self.board)
+        size = f"{board_name(self.board)}_" if self.board is not None else ""
+        self.settings = {"max_depth": game.max_moves, "playouts": 1000, "time_budget": None}
+        for key, name in setting_keys.items():
+            if key in config:
+                self.settings[name] = parse_duration(config[key]) if key == "time" else config[key]
+        if self.type == "qlearn":
+            self.settings["q_tables"] = load_q_tables(cls.__name__, cls.get_tokens(), size, True, config.get("q_table"))
+        elif self.type == "linear":
+            self.settings["linear_models"] = load_linear_models(game, size, config.get("q_table"))
+        elif self.type == "perfect":
+            self.settings["solution"] = game.load_solution(size)
+
+    # the entrant as a player for a new game, with its own transposition table, move ordering and search tree
+    def player(self) -> Player:
+        return Player(self.type, dict(self.settings, tt=TranspositionTable(), ordering=None, mcts=None))
+
+    # the config as a string, used to recognise the entrant's pairings from earlier runs even if it is renamed
+    def key(self) -> str:
+        return json.dumps(self.config, sort_keys=True)
+
+
+# play a share of a pairing's games in a worker process, returning [player 1 wins, player 2 wins, draws]
+# games are numbered across the pairing's tasks, so the starting player alternates the same as when they're played in one go
+def play_pairing(task):
+    pairing, first_game, games, seed = task
+    cls, entrants, pairings = worker_tournament
+    first, second = (entrants[e] for e in pairings[pairing])
+    game = cls(first.player(), second.player(), False, first.board)
+    if seed is not None:
+        random.seed(f"{seed}-{first.key()}-{second.key()}-{first_game}")
+    stats = [0, 0, 0]
+    for i in range(first_game, first_game + games):
+        stats[game.play(bool(i % 2))] += 1
+        game.reset()
+    return stats
+
+
+# fit elo ratings to the results of every pairing at once, with the bradley-terry model as bayeselo does
+# rather than updating them game by game, so the ratings don't depend on the order the games finish in
+# each player's strength is found by minorization-maximization, with draws counted as half a win for each player
+# returns each player's rating, with the ratings of each connected group of players averaging 0
+def fit_ratings(results: list[tuple[str, str, int, int, int]], iterations=10000) -> dict[str, float]:
+    scores = {}
+    games = {}
+    for first, second, first_wins, second_wins, draws in results:
+        scores[first] = scores.get(first, 0) + first_wins + (draws + prior_draws) / 2
+        scores[second] = scores.get(second, 0) + second_wins + (draws + prior_draws) / 2
+        played = first_wins + second_wins + draws + prior_draws
+        games.setdefault(first, {})[second] = played
+        games.setdefault(second, {})[first] = played
+
+    strengths = {name: 1.0 for name in scores}
+    for _ in range(iterations):
+        new = {name: scores[name] / sum(n / (strengths[name] + strengths[other]) for other, n in games[name].items())
+               for name in strengths}
+        change = max(abs(math.log(new[name] / strengths[name])) for name in strengths)
+        strengths = new
+        if change < 1e-9:
+            break
+
+    # the model only fixes the differences between ratings, so each group is centred on 0
+    ratings = {}
+    for name in strengths:
+        if name in ratings:
+            continue
+        group, stack = {name}, [name]
+        while stack:
+            for other in games[stack.pop()]:
+                if other not in group:
+                    group.add(other)
+                    stack.append(other)
+        mean = sum(math.log10(strengths[member]) for member in group) / len(group)
+        for member in group:
+            ratings[member] = 400 * (math.log10(strengths[member]) - mean)
+    return ratings
+
+
+# play a round-robin tournament between the players in a config file, and save the results and ratings next to it
+# every pair of players on the same board plays the given number of games, alternating who starts
+# the results are saved to <config>_results.json, and pairings already in it from an earlier run with the same
+# configs, number of games and seed aren't played again, so only new matchups are played when players are added
+def run_tournament(cls, default_board, args):
+    config_file = args[args.index("-tournament") + 1]
+    games = param_or_default(args, "-g", 20)
+    workers = param_or_default(args, "-j", 1)
+    seed = param_or_default(args, "-s", None)
+    with open(config_file) as file:
+        entrants = [Entrant(cls, config, default_board) for config in json.load(file)]
+    names = [entrant.name for entrant in entrants]
+    if len(set(names)) < len(names):
+        print("Every player in the tournament needs a different name.")
+        exit()
+
+    # each pair is put in a fixed order by config, so reordering the config file doesn't change the pairings
+    pairings = []
+    for a in range(len(entrants)):
+        for b in range(a + 1, len(entrants)):
+            if entrants[a].board == entrants[b].board:
+                pairings.append((a, b) if entrants[a].key() <= entrants[b].key() else (b, a))
+    keys = [json.dumps([cls.__name__, entrants[a].board, entrants[a].key(), entrants[b].key(), games, seed]) for a, b in pairings]
+
+    # results from the last run of the tournament, by pairing
+    results_name = f"{os.path.splitext(config_file)[0]}_results"
+    cached = {}
+    if os.path.exists(f"{results_name}.json"):
+        with open(f"{results_name}.json") as file:
+            cached = {pairing["key"]: pairing for pairing in json.load(file)["pairings"]}
+    to_play = [p for p, key in enumerate(keys) if key not in cached]
+    print(f"{len(pairings)} pairings, {len(pairings) - len(to_play)} already played")
+
+    # the games of each pairing are split into chunks, so there are a few chunks per worker
+    chunks = max(1, min(games, -(-workers * 4 // max(1, len(to_play)))))
+    sizes = [games // chunks + (c < games % chunks) for c in range(chunks)]
+    tasks = [(p, sum(sizes[:c]), size, seed) for p in to_play for c, size in enumerate(sizes) if size]
+    stats = {p: [0, 0, 0] for p in to_play}
+    tournament = (cls, entrants, pairings)
+    with tqdm(total=games * len(to_play)) as bar:
+        if workers > 1:
+            with Pool(workers, initializer=init_tournament_worker, initargs=(tournament,)) as pool:
+                for task, task_stats in zip(tasks, pool.imap(play_pairing, tasks)):
+                    stats[task[0]] = [total + s for total, s in zip(stats[task[0]], task_stats)]
+                    bar.update(task[2])
+        else:
+            init_tournament_worker(tournament)
+            for task in tasks:
+                stats[task[0]] = [total + s for total, s in zip(stats[task[0]], play_pairing(task))]
+                bar.update(task[2])
+
+    results = []
+    for p, ((a, b), key) in enumerate(zip(pairings, keys)):
+        if p in stats:
+            wins, draws = stats[p][:2], stats[p][2]
+        else:
+            wins, draws = cached[key]["wins"], cached[key]["draws"]
+        results.append({"key": key, "board": entrants[a].board, "players": [names[a], names[b]], "wins": wins, "draws": draws})
+    ratings = fit_ratings([(*result["players"], *result["wins"], result["draws"]) for result in results])
+    table = []
+    # ratings are only comparable between players on the same board, so the table is grouped by board
+    for entrant in sorted(entrants, key=lambda entrant: (board_name(entrant.board), -ratings.get(entrant.name, 0))):
+        played = [result for result in results if entrant.name in result["players"]]
+        score = sum(result["wins"][result["players"].index(entrant.name)] + result["draws"] / 2 for result in played)
+        table.append({"name": entrant.name, "type": entrant.type, "board": entrant.board, "elo": round(ratings.get(entrant.name, 0), 1),
+                      "games": games * len(played), "score": score})
+
+    # save the results - the json is also the cache of played pairings for the next run
+    with open(f"{results_name}.json", "w") as file:
+        json.dump({"game": cls.__name__, "games": games, "seed": seed, "ratings": table, "pairings": results}, file, indent=2)
+    with open(f"{results_name}_ratings.csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["rank", "name", "type", "board", "elo", "games", "score"])
+        for rank, row in enumerate(table, 1):
+            writer.writerow([rank, row["name"], row["type"], board_name(row["board"]), row["elo"], row["games"], row["score"]])
+    with open(f"{results_name}_pairings.csv", "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["board", "player1", "player2", "player1_wins", "player2_wins", "draws"])
+        for result in results:
+            writer.writerow([board_name(result["board"]), *result["players"], *result["wins"], result["draws"]])
+
+    for rank, row in enumerate(table, 1):
+        print(f"{rank}. {row['name']}: {row['elo']:+.0f} ({row['score']}/{row['games']})")
+    print(f"Results saved to {results_name}.json")
@@ -0,0 +1,55 @@
+import random
+
+# flags for what a stored score means
+# a search cut off by alpha-beta only gives a bound on the true score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# default memory cap for the table in megabytes
+default_memory = 64
+
+
+# generate a random 64 bit key for each player and cell
+# a position is hashed by xor-ing together the keys of every token on the board
+# a separate random generator is used so the global seed used for training isn't affected
+def zobrist_keys(cells: int, seed: int = 0) -> tuple[list[int], list[int]]:
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(cells)], [rng.getrandbits(64) for _ in range(cells)]
+
+
+# fixed size table of previously searched positions, indexed by zobrist hash
+# each slot holds (key, generation, score, depth, flag, best move)
+class TranspositionTable:
+    # rough number of bytes used by a filled slot - the list pointer, the entry tuple and the key
+    slot_size = 160
+
+    def __init__(self, memory: float = default_memory):
+        self.memory = memory
+        # the number of slots is rounded down to a power of 2 so the index is just the low bits of the key
+        slots = max(1, int(memory * 1024 * 1024 / self.slot_size))
+        self.size = 1 << (slots.bit_length() - 1)
+        self.index_mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    # start a new search
+    # minimax scores depend on the depth from the root, so entries from earlier searches can't be reused
+    # rather than clearing the table they are ignored and overwritten
+    def new_search(self):
+        self.generation += 1
+
+    # get the entry for a position, or None if it hasn't been searched
+    def lookup(self, key: int):
+        entry = self.entries[key & self.index_mask]
+        if entry is not None and entry[0] == key and entry[1] == self.generation:
+            return entry
+        return None
+
+    # store the result of searching a position
+    # the slot is replaced if it is empty, from an older search, or was searched to a lower depth
+    def store(self, key: int, score, depth: int, flag: int, move=None):
+        index = key & self.index_mask
+        entry = self.entries[index]
+        if entry is None or entry[1] != self.generation or depth >= entry[3]:
+            self.entries[index] = (key, self.generation, score, depth, flag, move)
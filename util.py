@@ -2,14 +2,18 @@ import json
 import pickle
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from qtable import MappedQTable, QTable, from_dict, save_mapped
 
 
 # dataclass for the player type
 # class used so players of the same type can be differentiated
+# settings are game attributes the player uses in place of the game's own, such as its search depth in a tournament
 @dataclass
 class Player:
     type: str
+    settings: dict = field(default_factory=dict)
 
 
 # dataclass for the qlearning parameters of the game
@@ -23,6 +27,11 @@ class Parameters:
     draw_threshold: float
 
 
+# raised inside minimax when the time budget for a move runs out
+class SearchTimeout(Exception):
+    pass
+
+
 # clear the screen
 def clear_screen():
     os.system('cls' if os.name=='nt' else 'clear')
@@ -30,7 +39,7 @@ def clear_screen():
 
 # get the value of a parameter or return the default value
 def param_or_default(args, flag, default):
-    if flag in args:
+    if flag in args and args.index(flag) + 1 < len(args):
         value = args[args.index(flag) + 1]
         if value.startswith("-"):
             return default
@@ -40,6 +49,27 @@ def param_or_default(args, flag, default):
     return default
 
 
+# get the format to print stats in from the command line - json if -stats is followed by json, otherwise text
+# None if -stats isn't given
+def get_stats_format(args) -> str | None:
+    if "-stats" not in args:
+        return None
+    return "json" if args[args.index("-stats") + 1:args.index("-stats") + 2] == ["json"] else "text"
+
+
+# convert a duration such as 200ms or 1.5s to seconds
+# a plain number is taken as milliseconds
+def parse_duration(value) -> float | None:
+    if value is None:
+        return None
+    value = str(value)
+    if value.endswith("ms"):
+        return float(value[:-2]) / 1000
+    if value.endswith("s"):
+        return float(value[:-1])
+    return float(value) / 1000
+
+
 # get the values of the parameters from the command line arguments
 def get_from_args(args):
     try:
@@ -54,21 +84,36 @@ def get_from_args(args):
 
 
 # load the two q-tables for the game
-def load_q_tables(game: str, tokens: list[str], size="", pickled=False) -> dict:
-    return {tokens[0]: load_q_table(f"{game}_{size}first", pickled), tokens[1]: load_q_table(f"{game}_{size}second", pickled)}
+# tables saved under another name, e.g. from a different training run, are loaded from q_tables/<name>_first and _second
+def load_q_tables(game: str, tokens: list[str], size="", pickled=False, name=None) -> dict:
+    prefix = f"{name}_" if name is not None else f"{game}_{size}"
+    return {tokens[0]: load_q_table(f"{prefix}first", pickled, game), tokens[1]: load_q_table(f"{prefix}second", pickled, game)}
 
 
 # load a q-table from a file
 # handles both json and pickle files
-def load_q_table(name: str, pickled: bool) -> dict:
+# tables saved as dictionaries are converted to compact q-tables
+# a table converted to the mapped format is used instead, unless the table has been saved again since
+def load_q_table(name: str, pickled: bool, game: str, mapped=True) -> QTable:
     file_name = f"q_tables/{name}.pkl" if pickled else f"q_tables/{name}.json"
     mode = 'rb' if pickled else 'r'
+    mapped_name = f"q_tables/{name}.qtb"
+    if mapped and os.path.exists(mapped_name) and (not os.path.exists(file_name) or os.path.getmtime(mapped_name) >= os.path.getmtime(file_name)):
+        return MappedQTable(mapped_name)
     if not os.path.exists(file_name):
         print(f"Q-learning has not been trained for {name}.")
         exit()
     with open(file_name, mode) as file:
-        if pickled:
-            return pickle.load(file)
-        else:
-            table = json.load(file)
-        return {k: {int(k2): v2 for k2, v2 in v.items()} for k, v in table.items()}
+        table = pickle.load(file) if pickled else json.load(file)
+    return table if isinstance(table, QTable) else from_dict(table, game)
+
+
+# convert the saved q-tables of a game to the mapped format, so qlearn players can start without loading them
+# the pickle is converted if there is one, otherwise the json
+def convert_q_tables(game: str, size=""):
+    for order in ("first", "second"):
+        name = f"{game}_{size}{order}"
+        pickled = os.path.exists(f"q_tables/{name}.pkl")
+        q_table = load_q_table(name, pickled, game, mapped=False)
+        save_mapped(q_table, f"q_tables/{name}.qtb")
+        print(f"Converted {name} ({len(q_table)} states) to q_tables/{name}.qtb")
@@ -0,0 +1,222 @@
+import numpy as np
+
+
+# every window of cells that could contain a winning run, as indices into the state string, in a (windows, cells) array
+# the 4-windows of a Connect4 board, or the winning subsets of TicTacToe
+def window_cells(game) -> np.ndarray:
+    if game.__class__.__name__ != "Connect4":
+        return np.array(game.winning_subsets)
+    windows = []
+    for row in range(game.height):
+        for col in range(game.width):
+            for rows, cols in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                if 0 <= row + 3 * rows < game.height and 0 <= col + 3 * cols < game.width:
+                    windows.append([(row + k * rows) * game.width + col + k * cols for k in range(4)])
+    return np.array(windows)
+
+
+# a batch of games played at once, with every board held in numpy arrays
+# each board is a row of cells in the same order as the game's state string - 0 for blank, 1 for the first player, 2 for the second
+# moves are numbered from 0 here - the column in Connect4, the cell in TicTacToe - so move m in the game is m - 1
+# finished games are reset straight away, so every board always has a game in progress
+class VecEnv:
+    # the player types that can play on the batch
+    player_types = ("random", "algo", "qlearn")
+
+    def __init__(self, game, n: int, seed=None):
+        self.game = game
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        if game.__class__.__name__ == "Connect4":
+            self.width, self.height = game.width, game.height
+            self.cells = self.width * self.height
+            self.actions = self.width
+            self.gravity = True
+            # the algo player looks for the move making the most runs of 3, then of 2, and only takes it if it adds to the current count
+            self.thresholds = (3, 2)
+            self.beat_current = True
+            chars = "RB"
+        else:
+            self.width = self.height = 3
+            self.cells = self.actions = 9
+            self.gravity = False
+            # the algo player looks for the move making the most doubles, and takes it if there are any
+            self.thresholds = (2,)
+            self.beat_current = False
+            chars = "".join(game.get_tokens())
+        self.windows = window_cells(game)
+        self.window_size = self.windows.shape[1]
+        # the character each cell value is given in the state string
+        self.chars = np.array([ord(" ")] + [ord(c) for c in chars], dtype=np.uint8)
+
+        self.boards = np.zeros((n, self.cells), dtype=np.int8)
+        self.heights = np.zeros((n, self.actions), dtype=np.int8)
+        self.player = np.ones(n, dtype=np.int8)  # the player to move on each board, 1 or 2
+        self.moves = np.zeros(n, dtype=np.int16)  # the number of moves made on each board
+        self.all = np.arange(n)
+
+    # reset the boards given by a boolean mask or array of indices, or every board if none are given
+    def reset(self, boards=None):
+        if boards is None:
+            boards = self.all
+        self.boards[boards] = 0
+        self.heights[boards] = 0
+        self.player[boards] = 1
+        self.moves[boards] = 0
+
+    # the state string of a single board, as the game would give it
+    def state(self, i: int) -> str:
+        return self.chars[self.boards[i]].tobytes().decode()
+
+    # the legal moves of a single board, numbered as the game numbers them
+    def legal_moves(self, i: int) -> list[int]:
+        return (np.flatnonzero(self.legal_mask([i])[0]) + 1).tolist()
+
+    # which moves are legal on each of the given boards, as a (boards, moves) array
+    def legal_mask(self, idx=None):
+        if idx is None:
+            idx = self.all
+        if self.gravity:
+            return self.heights[idx] < self.height
+        return self.boards[idx] == 0
+
+    # the cell each move would fill on each of the given boards, as a (boards, moves) array
+    # a move into a full column gives a cell in the column below it - illegal moves have to be masked out by the caller
+    def target_cells(self, idx):
+        if self.gravity:
+            rows = np.minimum(self.heights[idx], self.height - 1)
+            return rows * self.width + np.arange(self.width)
+        return np.broadcast_to(np.arange(self.cells), (len(idx), self.cells))
+
+    # check which boards have a window full of the given player's tokens
+    # boards can have any number of leading dimensions, player has to broadcast against them
+    def wins(self, boards, player):
+        lines = boards[..., self.windows]
+        return (lines == player[..., None, None]).all(-1).any(-1)
+
+    # make a move on every board, then reset the boards whose games ended
+    # every move has to be legal
+    # returns the winner of each board (1 or 2, 0 if the game didn't end or was a tie),
+    # whether the game on each board ended, and the number of moves each finished game lasted
+    def step(self, actions):
+        actions = np.asarray(actions)
+        if self.gravity:
+            cells = self.heights[self.all, actions] * self.width + actions
+            self.heights[self.all, actions] += 1
+        else:
+            cells = actions
+        self.boards[self.all, cells] = self.player
+        self.moves += 1
+
+        won = self.wins(self.boards, self.player)
+        done = won | (self.moves == self.cells)
+        winners = np.where(won, self.player, 0)
+        lengths = np.where(done, self.moves, 0)
+        self.player = 3 - self.player
+        self.reset(done)
+        return winners, done, lengths
+
+    # choose a random True entry from each row of a mask
+    def choose(self, mask):
+        return np.argmax(np.where(mask, self.rng.random(mask.shape), -1.0), axis=1)
+
+    # choose a random legal move for each of the given boards
+    def random_actions(self, idx=None):
+        return self.choose(self.legal_mask(idx))
+
+    # choose a move for each of the given boards the same way as the game's algorithm_choose_move
+    # win if possible, otherwise block the opponent's win, otherwise make the most runs one move from winning
+    # every move of every board is tried at once on a (boards, moves, cells) copy of the boards
+    # the moves are chosen for the player to move on each board, or for the given player (1 or 2) on all of them
+    def algo_actions(self, idx=None, as_player=None):
+        if idx is None:
+            idx = self.all
+        boards = self.boards[idx]
+        player = self.player[idx] if as_player is None else np.full(len(idx), as_player, dtype=self.player.dtype)
+        legal = self.legal_mask(idx)
+        rows = np.arange(len(idx))[:, None]
+        cols = np.arange(self.actions)[None, :]
+        cells = self.target_cells(idx)
+        after = np.repeat(boards[:, None, :], self.actions, axis=1)
+
+        actions = self.choose(legal)
+        decided = np.zeros(len(idx), dtype=bool)
+        # the first winning move for the player, then the first for the opponent, as the moves are checked in order
+        for token in (player, 3 - player):
+            after[rows, cols, cells] = token[:, None]
+            wins = self.wins(after, token[:, None]) & legal
+            found = wins.any(1) & ~decided
+            actions[found] = wins[found].argmax(1)
+            decided |= found
+
+        # count the windows with `threshold` of the player's tokens and the rest blank, before and after each move
+        after[rows, cols, cells] = player[:, None]
+        lines = after[:, :, self.windows]
+        own = (lines == player[:, None, None, None]).sum(-1)
+        blank = (lines == 0).sum(-1)
+        current = boards[:, self.windows]
+        current_own = (current == player[:, None, None]).sum(-1)
+        current_blank = (current == 0).sum(-1)
+        for threshold in self.thresholds:
+            counts = ((own == threshold) & (blank == self.window_size - threshold)).sum(-1)
+            counts = np.where(legal, counts, -1)
+            best = counts.max(1)
+            baseline = 0
+            if self.beat_current:
+                baseline = ((current_own == threshold) & (current_blank == self.window_size - threshold)).sum(-1)
+            found = (best > baseline) & ~decided
+            actions[found] = self.choose(counts[found] == best[found, None])
+            decided |= found
+        return actions
+
+    # choose a move for each of the given boards with the game's q-table for the player to move, as the qlearn player would
+    # the q-tables are python objects, so this goes one board at a time
+    def qlearn_actions(self, idx):
+        tokens = self.game.get_tokens()
+        actions = np.empty(len(idx), dtype=np.int64)
+        for j, i in enumerate(idx):
+            q_table = self.game.q_tables[tokens[self.player[i] - 1]]
+            actions[j] = self.game.qlearn_move(self.state(i), self.legal_moves(i), q_table) - 1
+        return actions
+
+    # choose moves for the given boards for a player type
+    def player_actions(self, player_type: str, idx):
+        match player_type:
+            case "random":
+                return self.random_actions(idx)
+            case "algo":
+                return self.algo_actions(idx)
+            case "qlearn":
+                return self.qlearn_actions(idx)
+        raise ValueError(f"{player_type} players can't be played on the vectorised environment")
+
+    # play games between two player types, returning [player 1 wins, player 2 wins, ties] as Game.start counts them
+    # if reverse_order isn't given the starting player alternates each game, otherwise it is used for every game
+    # once every game has been started the spare boards keep playing, but their games aren't counted
+    def play(self, players: tuple[str, str], games: int, reverse_order=None) -> list[int]:
+        self.reset()
+        stats = [0, 0, 0]
+        game_ids = self.all.copy()
+        # whether player 2 started the game on each board
+        reversed_order = game_ids % 2 == 1 if reverse_order is None else np.full(self.n, reverse_order)
+        next_game = self.n
+        finished = 0
+        while finished < games:
+            # the player moving on each board - 0 for player 1, 1 for player 2
+            mover = (self.player - 1) ^ reversed_order
+            actions = np.empty(self.n, dtype=np.int64)
+            for p, player_type in enumerate(players):
+                idx = np.flatnonzero(mover == p)
+                if len(idx):
+                    actions[idx] = self.player_actions(player_type, idx)
+
+            winners, done, _ = self.step(actions)
+            for i in np.flatnonzero(done):
+                if game_ids[i] < games:
+                    stats[(winners[i] - 1) ^ reversed_order[i] if winners[i] else 2] += 1
+                    finished += 1
+                game_ids[i] = next_game
+                if reverse_order is None:
+                    reversed_order[i] = next_game % 2 == 1
+                next_game += 1
+        return stats